@@ -0,0 +1,98 @@
+"""Result summaries and JSON baselines shared by the benchmark scripts.
+
+A results file looks like::
+
+    {"meta": {...}, "results": {"<scenario>": {"requests": ..., "rps": ..., "p50_ms": ..., "p99_ms": ...}}}
+
+``compare()`` flags a scenario whose throughput dropped, or whose p99 rose,
+by more than the threshold relative to the baseline.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> Dict:
+    """Throughput and latency percentiles (in ms) for one scenario."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 3),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 3),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def metadata(**settings) -> Dict:
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **settings,
+    }
+
+
+def save(path: str, meta: Dict, results: Dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict, results: Dict, threshold: float) -> List[str]:
+    """Print each scenario against ``baseline`` and return the regressions."""
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    print(f"{'scenario':<28}{'rps':>12}{'Δrps':>9}{'p99 ms':>12}{'Δp99':>9}")
+    for scenario, current in results.items():
+        previous = baseline_results.get(scenario)
+        if previous is None:
+            print(f"{scenario:<28}{current['rps']:>12.1f}{'new':>9}{current['p99_ms']:>12.3f}{'new':>9}")
+            continue
+        rps_change = _change(previous["rps"], current["rps"])
+        p99_change = _change(previous["p99_ms"], current["p99_ms"])
+        print(f"{scenario:<28}{current['rps']:>12.1f}{rps_change:>+8.0%} {current['p99_ms']:>12.3f}{p99_change:>+8.0%}")
+        if rps_change < -threshold:
+            regressions.append(f"{scenario}: throughput {previous['rps']} -> {current['rps']} req/s")
+        if p99_change > threshold:
+            regressions.append(f"{scenario}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+
+def _change(previous: float, current: float) -> float:
+    return (current - previous) / previous if previous else 0.0
+
+
+def print_results(results: Dict) -> None:
+    print(f"{'scenario':<28}{'requests':>10}{'errors':>8}{'rps':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for scenario, summary in results.items():
+        print(f"{scenario:<28}{summary['requests']:>10}{summary['errors']:>8}{summary['rps']:>12.1f}"
+              f"{summary['p50_ms']:>10.3f}{summary['p99_ms']:>10.3f}")
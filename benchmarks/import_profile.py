@@ -0,0 +1,81 @@
+"""Import-time profile of the service, from ``python -X importtime``.
+
+Imports ``--module`` (price_app by default) in a fresh interpreter and lists
+the slowest imports by cumulative time; this is what every new uvicorn
+worker pays before it can serve::
+
+    python -m benchmarks.import_profile --top 25 --save benchmarks/results/imports.json
+
+The test suite writes the same profile as an artifact (see
+tests/test_import_time.py).
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+# aioredis 2.0.1 does not import on Python >= 3.11; as in request_path, stand
+# redis.asyncio in for it so the profile can run on newer interpreters.
+_AIOREDIS_FALLBACK = (
+    "import sys\n"
+    "try:\n"
+    "    import aioredis\n"
+    "except (ImportError, TypeError):\n"
+    "    import redis.asyncio, redis.exceptions\n"
+    "    sys.modules['aioredis'] = redis.asyncio\n"
+    "    sys.modules['aioredis.exceptions'] = redis.exceptions\n"
+)
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def parse(stderr: str) -> List[Dict]:
+    """One entry per imported module, in import order; times in microseconds."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({'module': module, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us),
+                            'depth': len(indent) // 2})
+    return entries
+
+
+def profile(module: str = 'price_app') -> List[Dict]:
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'{_AIOREDIS_FALLBACK}import {module}'],
+                               capture_output=True, text=True, check=True)
+    return parse(completed.stderr)
+
+
+def slowest(entries: List[Dict], top: int) -> List[Dict]:
+    return sorted(entries, key=lambda entry: entry['cumulative_us'], reverse=True)[:top]
+
+
+def save(path: str, module: str, entries: List[Dict]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    total_us = max((entry['cumulative_us'] for entry in entries if entry['module'] == module), default=0)
+    with open(path, 'w') as f:
+        json.dump({'module': module, 'total_ms': round(total_us / 1000, 1), 'imports': entries}, f, indent=2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='price_app')
+    parser.add_argument('--top', type=int, default=25, help='slowest imports to print')
+    parser.add_argument('--save', help='write the full profile to this JSON file')
+    args = parser.parse_args()
+
+    entries = profile(args.module)
+    print(f"{'module':<60}{'self ms':>10}{'cumul. ms':>12}")
+    for entry in slowest(entries, args.top):
+        print(f"{entry['module']:<60}{entry['self_us'] / 1000:>10.1f}{entry['cumulative_us'] / 1000:>12.1f}")
+    if args.save:
+        save(args.save, args.module, entries)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
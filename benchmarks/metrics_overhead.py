@@ -0,0 +1,116 @@
+"""Per-request cost of the request metrics, with and without MetricsMiddleware.
+
+Times a no-op ASGI app wrapped in:
+
+- ``passthrough``: nothing; the floor to subtract from the others
+- ``manual``: the per-handler pattern price_app used before the middleware
+  (``labels()`` on every call, gauge inc/dec, histogram observe)
+- ``middleware``: MetricsMiddleware writing counts on every request
+- ``middleware_batched``: MetricsMiddleware flushing counts once a second
+
+``--multiprocess`` runs with PROMETHEUS_MULTIPROC_DIR set to a temporary
+directory, as under supervisord, where each metric write goes to an mmap'd
+file::
+
+    python -m benchmarks.metrics_overhead --multiprocess --save benchmarks/results/metrics.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from benchmarks import baseline
+
+
+async def _noop_app(scope, receive, send):
+    pass
+
+
+def _targets(flush_interval: float) -> Dict[str, Callable]:
+    # Imported here so --multiprocess can set the environment first
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+    from pricing.metrics_middleware import MetricsMiddleware, Route
+
+    def metrics(prefix):
+        registry = CollectorRegistry()
+        return (Counter(f"{prefix}_requests_total", "", ["endpoint", "method", "type"], registry=registry),
+                Gauge(f"{prefix}_current_requests", "", registry=registry),
+                Histogram(f"{prefix}_request_latency_seconds", "", ["endpoint", "type"], registry=registry))
+
+    request_count, current_requests, request_latency = metrics("manual")
+
+    async def manual(scope, receive, send):
+        start_time = time.time()
+        request_count.labels(endpoint="price_single", method="GET", type="single").inc()
+        current_requests.inc()
+        try:
+            await _noop_app(scope, receive, send)
+        finally:
+            request_latency.labels(endpoint="price_single", type="single").observe(time.time() - start_time)
+            current_requests.dec()
+
+    routes = [Route('GET', '/price/', 'price_single', 'single', prefix=True)]
+    return {
+        'passthrough': _noop_app,
+        'manual': manual,
+        'middleware': MetricsMiddleware(_noop_app, routes, *metrics("unbatched"), flush_interval=0),
+        'middleware_batched': MetricsMiddleware(_noop_app, routes, *metrics("batched"), flush_interval=flush_interval),
+    }
+
+
+async def run(args) -> Dict:
+    scope = {'type': 'http', 'method': 'GET', 'path': '/price/ethereum'}
+    results = {}
+    for name, target in _targets(args.flush_interval).items():
+        per_call = []
+        started = time.perf_counter()
+        for _ in range(args.repeats):
+            batch_started = time.perf_counter()
+            for _ in range(args.calls):
+                await target(scope, None, None)
+            per_call.append((time.perf_counter() - batch_started) / args.calls)
+        summary = baseline.summarize(per_call, time.perf_counter() - started)
+        # summarize() counts batches; report calls per second instead
+        summary["requests"] = args.repeats * args.calls
+        summary["rps"] = round(summary["requests"] / (time.perf_counter() - started), 1)
+        results[name] = summary
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000, help='calls per timed batch')
+    parser.add_argument('--repeats', type=int, default=50, help='timed batches per scenario')
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--multiprocess', action='store_true', help='use prometheus_client multiprocess mode')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression (default 25%%)')
+    args = parser.parse_args()
+
+    if args.multiprocess:
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='metrics_overhead_')
+    results = asyncio.run(run(args))
+    # p50/p99 here are per-call means of each timed batch
+    baseline.print_results(results)
+    floor = 1e6 / results['passthrough']['rps']
+    for name, summary in results.items():
+        print(f"{name:<28}{1e6 / summary['rps'] - floor:>10.2f} µs/request over passthrough")
+
+    if args.save:
+        meta = baseline.metadata(benchmark='metrics_overhead', calls=args.calls, repeats=args.repeats,
+                                 multiprocess=args.multiprocess, flush_interval=args.flush_interval)
+        baseline.save(args.save, meta, results)
+    if args.compare:
+        regressions = baseline.compare(baseline.load(args.compare), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
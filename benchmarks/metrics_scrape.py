@@ -0,0 +1,115 @@
+"""Cost of one /metrics scrape in multiprocess mode as the worker count grows.
+
+For each worker count, forks that many processes into a fresh
+PROMETHEUS_MULTIPROC_DIR; each records the app's request, stage and
+scheduler metrics (the same names, labels and buckets as price_app) and
+exits. Then times scrapes through ``metrics_export.CachedExposition``:
+
+- ``uncached_<n>w``: every scrape reads and merges all the .db files
+- ``cached_<n>w``: scrapes inside METRICS_CACHE_SECONDS reuse the last render
+
+::
+
+    python -m benchmarks.metrics_scrape --workers 1,2,4,8,16,32 --save benchmarks/results/scrape.json
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks import baseline
+
+ROUTES = [('transform-asset', 'GET', 'transformed'), ('price_single', 'GET', 'single'),
+          ('price_multiple', 'GET', 'list'), ('price_bulk', 'POST', 'bulk'), ('price_stream', 'GET', 'stream')]
+STAGES = ['redis_url_resolve', 'redis_client', 'redis_hgetall', 'redis_pipeline', 'parse', 'snapshot',
+          'batch_fetch', 'redis_lookup', 'serialize']
+
+
+def _record_worker_metrics() -> None:
+    # Imported in the child, after PROMETHEUS_MULTIPROC_DIR is set
+    from prometheus_client import Counter, Gauge, Histogram
+    from pricing.instrumentation import STAGE_LATENCY
+
+    request_count = Counter("requests_total", "", ["endpoint", "method", "type"])
+    request_latency = Histogram("request_latency_seconds", "", ["endpoint", "type"])
+    current_requests = Gauge("current_requests", "")
+    Histogram("scheduler_task_duration_seconds", "").observe(0.02)
+    for endpoint, method, kind in ROUTES:
+        request_count.labels(endpoint=endpoint, method=method, type=kind).inc(10)
+        request_latency.labels(endpoint=endpoint, type=kind).observe(0.005)
+    for name in STAGES:
+        STAGE_LATENCY.labels(name).observe(0.001)
+    current_requests.set(1)
+
+
+def _populate(path: str, workers: int) -> None:
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _record_worker_metrics()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+
+def _time_scrapes(exposition, scrapes: int) -> Dict:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(scrapes):
+        scrape_started = time.perf_counter()
+        exposition.render()
+        latencies.append(time.perf_counter() - scrape_started)
+    return baseline.summarize(latencies, time.perf_counter() - started)
+
+
+def run(args) -> Dict:
+    from pricing.metrics_export import CachedExposition, build_registry
+
+    results = {}
+    for workers in args.workers:
+        path = tempfile.mkdtemp(prefix='metrics_scrape_')
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = path
+        try:
+            _populate(path, workers)
+            registry = build_registry(path)
+            results[f'uncached_{workers}w'] = _time_scrapes(CachedExposition(registry, ttl=0), args.scrapes)
+            results[f'cached_{workers}w'] = _time_scrapes(CachedExposition(registry, ttl=args.cache_seconds),
+                                                          args.scrapes)
+        finally:
+            shutil.rmtree(path)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=lambda s: [int(n) for n in s.split(',')], default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--scrapes', type=int, default=200, help='timed scrapes per scenario')
+    parser.add_argument('--cache-seconds', type=float, default=2.0)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression (default 25%%)')
+    args = parser.parse_args()
+
+    # Must be set before prometheus_client is first imported, so the children write .db files
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.gettempdir()
+    results = run(args)
+    baseline.print_results(results)
+
+    if args.save:
+        meta = baseline.metadata(benchmark='metrics_scrape', workers=args.workers, scrapes=args.scrapes,
+                                 cache_seconds=args.cache_seconds)
+        baseline.save(args.save, meta, results)
+    if args.compare:
+        regressions = baseline.compare(baseline.load(args.compare), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Throughput and latency of the request path, in-process.
+
+Drives ``price_app.app`` through Quart's test client against fakeredis (or a
+real server with ``--redis-url``) seeded with ``--assets`` synthetic
+``price:*`` hashes, and reports req/s, p50 and p99 per scenario::
+
+    python -m benchmarks.request_path --save benchmarks/results/baseline.json
+    python -m benchmarks.request_path --compare benchmarks/results/baseline.json
+
+``--compare`` exits with status 1 if any scenario's throughput dropped, or
+its p99 rose, by more than ``--threshold``. The app and the cryptofund20x
+packages must be importable, as for the test suite.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+from benchmarks import baseline
+
+# aioredis 2.0.1 does not import on Python >= 3.11; redis.asyncio is its
+# successor with the same client API, so stand it in for real-server runs.
+try:
+    import aioredis  # noqa: F401
+except (ImportError, TypeError):
+    import redis.asyncio
+    import redis.exceptions
+    sys.modules['aioredis'] = redis.asyncio
+    sys.modules['aioredis.exceptions'] = redis.exceptions
+
+import price_app  # noqa: E402
+from pricing import redis_cache_service  # noqa: E402
+
+TRANSFORM_ASSETS = ['eth', 'weth', 'btc', 'wbtc', 'usdc', 'not-an-alias']
+
+
+def _asset_names(count: int) -> List[str]:
+    return [f"bench-asset-{i:05d}" for i in range(count)]
+
+
+async def _seed(client, assets: List[str]) -> None:
+    now = datetime.now().isoformat()
+    pipe = client.pipeline(transaction=False)
+    for i, asset in enumerate(assets):
+        pipe.hset(f"{redis_cache_service.PRICE_KEY_PREFIX}{asset}", mapping={
+            'usd_price': str(1 + i * 0.01),
+            'volume_last_24_hours': str(1_000_000 + i),
+            'current_marketcap_usd': str(50_000_000 + i),
+            'timestamp': now,
+        })
+    await pipe.execute()
+
+
+def _redis_backend(redis_url: str):
+    """Return (aioredis stand-in, client used for seeding)."""
+    if redis_url:
+        aioredis = sys.modules['aioredis']
+        return aioredis, aioredis.from_url(redis_url, decode_responses=True)
+    import fakeredis.aioredis
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    return SimpleNamespace(BlockingConnectionPool=SimpleNamespace(from_url=lambda url, **kwargs: None),
+                           Redis=lambda connection_pool: client), client
+
+
+async def _run_scenario(test_client, next_path: Callable[[], str], requests: int, concurrency: int) -> Dict:
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            path = next_path()
+            started = time.perf_counter()
+            response = await test_client.get(path)
+            await response.get_data()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return baseline.summarize(latencies, time.perf_counter() - started, errors)
+
+
+def _scenarios(assets: List[str], batch_sizes: List[int], rng: random.Random) -> Dict[str, Callable[[], str]]:
+    scenarios = {'price_single': lambda: f"/price/{rng.choice(assets)}"}
+    for size in batch_sizes:
+        scenarios[f'prices_batch_{size}'] = (
+            lambda size=size: "/prices?assets=" + ",".join(rng.sample(assets, min(size, len(assets)))))
+    scenarios['transform_asset'] = lambda: f"/transform-asset?asset={rng.choice(TRANSFORM_ASSETS)}"
+    return scenarios
+
+
+async def run(args) -> Dict:
+    assets = _asset_names(args.assets)
+    rng = random.Random(args.seed)
+    aioredis, seed_client = _redis_backend(args.redis_url)
+    await _seed(seed_client, assets)
+
+    results = {}
+    with patch.object(redis_cache_service, 'aioredis', aioredis), \
+            patch.object(redis_cache_service, 'get_redis_url', lambda db=0: args.redis_url or 'redis://fakeredis'):
+        async with price_app.app.test_app() as test_app:
+            test_client = test_app.test_client()
+            for name, next_path in _scenarios(assets, args.batch_sizes, rng).items():
+                await _run_scenario(test_client, next_path, args.warmup, args.concurrency)
+                results[name] = await _run_scenario(test_client, next_path, args.requests, args.concurrency)
+                print(f"{name}: {results[name]['rps']} req/s", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assets', type=int, default=1000, help='synthetic price:* hashes to seed')
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=200, help='unmeasured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='requests in flight')
+    parser.add_argument('--batch-sizes', type=lambda s: [int(n) for n in s.split(',')], default=[1, 10, 50, 100, 500])
+    parser.add_argument('--redis-url', help='benchmark against this Redis instead of fakeredis (keys are written)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log', action='store_true', help='keep INFO logging on (off by default)')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression (default 25%%)')
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+    results = asyncio.run(run(args))
+    baseline.print_results(results)
+
+    if args.save:
+        meta = baseline.metadata(benchmark='request_path', assets=args.assets, requests=args.requests,
+                                 concurrency=args.concurrency, redis='server' if args.redis_url else 'fakeredis')
+        baseline.save(args.save, meta, results)
+    if args.compare:
+        regressions = baseline.compare(baseline.load(args.compare), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,29 +1,36 @@
 import os
-from prometheus_client import start_http_server, multiprocess, CollectorRegistry, ProcessCollector
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-if __name__ == '__main__':
-    # Ensure directory exists
-    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
-    os.makedirs(metrics_dir, exist_ok=True)
+from prometheus_client import CONTENT_TYPE_LATEST
 
-    # Create registry
-    registry = CollectorRegistry()
+from pricing import metrics_export
 
-    # Add process collector to the registry
-    ProcessCollector(registry=registry)
 
-    # Add multiprocess collector
-    multiprocess.MultiProcessCollector(registry)
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the aggregated exposition; scrapes within METRICS_CACHE_SECONDS share one render."""
 
-    # Start metrics server
-    metrics_port = int(os.environ.get('PROMETHEUS_METRICS_PORT', 9105))
-    start_http_server(metrics_port, registry=registry)
+    def do_GET(self):
+        output = metrics_export.render()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE_LATEST)
+        self.send_header('Content-Length', str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+    def log_message(self, format, *args):
+        pass
 
-    # Keep the process running
-    while True:
-        try:
-            import time
 
-            time.sleep(1)
-        except KeyboardInterrupt:
-            break
\ No newline at end of file
+if __name__ == '__main__':
+    # Ensure directory exists
+    metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    # Start metrics server
+    metrics_port = int(os.environ.get('PROMETHEUS_METRICS_PORT', 9105))
+    server = ThreadingHTTPServer(('', metrics_port), MetricsHandler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
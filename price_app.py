@@ -1,21 +1,27 @@
 import logging
 import os
-import time
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
 
 import prometheus_client
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from cryptofund20x_misc import config
-from cryptofund20x_misc.custom_formatter import CustomFormatter
 from cryptofund20x_interfaces.loggable_interface import TraceContextFilter
 from cryptofund20x_services.url_util import extract_trace_context
 from opentelemetry import trace, context as otel_context
 from opentelemetry.propagate import set_global_textmap
 from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST, core, ProcessCollector
-from quart import request, Quart, jsonify
+from prometheus_client import Counter, Histogram, Gauge, CONTENT_TYPE_LATEST, core, ProcessCollector
+from quart import request, Quart, jsonify, make_response
 
 import transformer
 from price_service import PriceService
+from pricing import (last_known_good, logging_setup, metrics_export, price_snapshot, price_stream, redis_cache_service,
+                     serialization)
+from pricing.instrumentation import probe_event_loop_lag, stage
+from pricing.metrics_middleware import MetricsMiddleware, Route
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # Configure global propagator for trace context extraction from HTTP headers
 # This MUST be set before calling extract() to parse traceparent headers
@@ -39,17 +45,25 @@ if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
 
 # Set up logging
 logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-handler.setFormatter(CustomFormatter())
-handler.addFilter(TraceContextFilter(None))
-logger.addHandler(handler)
+logging_setup.configure_logger(logger, filters=[TraceContextFilter(None)])
 logger.setLevel(logging.INFO)
 
 # Initialize OpenTelemetry tracer
 tracer = trace.get_tracer(__name__)
 
 app = Quart(__name__)
-scheduler = AsyncIOScheduler()
+# Created in startup(), so importing the app does not load APScheduler
+scheduler: Optional['AsyncIOScheduler'] = None
+# App-scoped PriceService, created in startup()
+price_service: PriceService = None
+ALIASES_RELOAD_INTERVAL = float(os.environ.get('ASSET_ALIASES_RELOAD_SECONDS', 30))
+# Upper bound on assets in one POST /prices body
+MAX_BULK_ASSETS = int(os.environ.get('PRICES_MAX_BULK_ASSETS', 2000))
+_BULK_FORMATS = ('object', 'columnar')
+# A comment line is sent on idle streams this often, so proxies keep them open
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get('PRICE_STREAM_KEEPALIVE_SECONDS', 15))
+# How often to sample event loop lag; 0 disables the probe
+LOOP_LAG_PROBE_INTERVAL = float(os.environ.get('EVENT_LOOP_LAG_PROBE_SECONDS', 1))
 
 # Prometheus Metrics
 REQUEST_COUNT = Counter("requests_total", "Total number of requests", ["endpoint", "method", "type"])
@@ -59,6 +73,17 @@ CURRENT_REQUESTS = Gauge("current_requests", "Number of in-progress requests")
 SCHEDULER_TASK_DURATION = Histogram("scheduler_task_duration_seconds", "Duration of scheduled cache update task")
 SCHEDULER_TASK_SUCCESS = Counter("scheduler_task_success_total", "Number of successful scheduled cache updates")
 
+# Request count, latency and in-progress accounting for the endpoints below,
+# done once per request around the whole ASGI call
+metrics_middleware = MetricsMiddleware(app.asgi_app, [
+    Route('GET', '/transform-asset', 'transform-asset', 'transformed'),
+    Route('GET', '/price/', 'price_single', 'single', prefix=True),
+    Route('GET', '/prices', 'price_multiple', 'list'),
+    Route('POST', '/prices', 'price_bulk', 'bulk'),
+    Route('GET', '/stream/prices', 'price_stream', 'stream', timed=False),
+], REQUEST_COUNT, CURRENT_REQUESTS, REQUEST_LATENCY)
+app.asgi_app = metrics_middleware
+
 
 @app.route('/')
 async def health_check():
@@ -68,33 +93,32 @@ async def health_check():
 
 @app.route('/metrics', methods=['GET'])
 async def metrics():
-    """Expose Prometheus metrics."""
-    return generate_latest(), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+    """Expose Prometheus metrics when running as a single process.
+
+    In multiprocess mode metrics_server.py is the only exposition endpoint;
+    serving the same aggregate here would double-count it for a scraper
+    that hits both ports.
+    """
+    if metrics_export.multiprocess_dir():
+        return jsonify({"error": "Metrics are served by the metrics server port in multiprocess mode"}), 404
+    return metrics_export.render(), 200, {'Content-Type': CONTENT_TYPE_LATEST}
 
 
 @app.route('/transform-asset', methods=['GET'])
 async def transform_asset():
-    start_time = time.time()
-    REQUEST_COUNT.labels(endpoint="transform-asset", method="GET", type="transformed").inc()
-    CURRENT_REQUESTS.inc()
-
     asset = request.args.get('asset')
     if not asset:
         logger.error('No asset specified')
         ERROR_COUNT.labels(endpoint="transform-asset", error_type="missing_asset").inc()
-        CURRENT_REQUESTS.dec()
         return jsonify({"error": "No asset specified"}), 400
 
     try:
-        logger.info(f"Transforming asset {asset}")
+        logger.info("Transforming asset %s", asset, extra={'asset': asset})
         transformed_asset = transformer.transform_asset(asset)
-        REQUEST_LATENCY.labels(endpoint="transform-asset", type="transformed").observe(time.time() - start_time)
-        CURRENT_REQUESTS.dec()
         return jsonify({"transformed_asset": transformed_asset, "initial_asset": asset}), 200
     except Exception as e:
         logger.error(f"Error transforming asset {asset}: {e}")
         ERROR_COUNT.labels(endpoint="transform-asset", error_type="exception").inc()
-        CURRENT_REQUESTS.dec()
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -107,45 +131,30 @@ async def price_single(asset: str):
         ERROR_COUNT.labels(endpoint="price_single", error_type="invalid_input").inc()
         return jsonify({"error": "Invalid asset provided"}), 400
 
-    # Extract trace context from incoming HTTP headers
-    request_headers_dict = dict(request.headers)
-    print(f"[DEBUG price_app /price] Request headers: {request_headers_dict}")
-
     # Extract trace context from HTTP headers
     # extract_trace_context handles header normalization internally
-    trace_context = extract_trace_context(request_headers_dict)
+    trace_context = extract_trace_context(dict(request.headers))
     context_token = otel_context.attach(trace_context)
 
-    start_time = time.time()
-    REQUEST_COUNT.labels(endpoint="price_single", method="GET", type="single").inc()
-    CURRENT_REQUESTS.inc()
-
     try:
-        logger.info(f"Fetching price for asset: {asset}")
-        price_exec = PriceService()
-        result = await price_exec.get_single_price(asset)
+        canonical_asset = transformer.transform_asset(asset)
+        logger.info("Fetching price for asset: %s (canonical: %s)", asset, canonical_asset,
+                    extra={'asset': canonical_asset, 'endpoint': 'price_single'})
+        result, stale = await price_service.get_single_price(canonical_asset)
 
         if result is None:
-            logger.warning(f"No price found for {asset}")
+            logger.warning("No price found for %s", asset, extra={'asset': asset})
             ERROR_COUNT.labels(endpoint="price_single", error_type="not_found").inc()
-            CURRENT_REQUESTS.dec()
             return jsonify({"error": f"Price data not found for {asset}"}), 404
 
-        response_data = {
-            "asset": asset,
-            "usd_price": result["usd_price"],
-            "volume_last_24_hours": result["volume_last_24_hours"],
-            "current_marketcap_usd": result["current_marketcap_usd"],
-        }
+        with stage('serialize'):
+            body = serialization.price_response(asset, canonical_asset, result, stale)
 
-        REQUEST_LATENCY.labels(endpoint="price_single", type="single").observe(time.time() - start_time)
-        CURRENT_REQUESTS.dec()
-        return jsonify(response_data), 200
+        return body, 200, serialization.price_headers([result], stale)
 
     except Exception as e:
         logger.error(f"Error fetching price for {asset}: {e}")
         ERROR_COUNT.labels(endpoint="price_single", error_type="exception").inc()
-        CURRENT_REQUESTS.dec()
         return jsonify({"error": "Internal server error"}), 500
     finally:
         # Detach the trace context to clean up
@@ -155,63 +164,214 @@ async def price_single(asset: str):
 @app.route('/prices', methods=['GET'])
 async def price_multiple():
     """Fetch prices for multiple assets."""
-    # Extract trace context from incoming HTTP headers
-    request_headers_dict = dict(request.headers)
-    print(f"[DEBUG price_app /prices] Request headers: {request_headers_dict}")
-
     # Extract trace context from HTTP headers
     # extract_trace_context handles header normalization internally
-    trace_context = extract_trace_context(request_headers_dict)
+    trace_context = extract_trace_context(dict(request.headers))
     context_token = otel_context.attach(trace_context)
 
-    start_time = time.time()
-    REQUEST_COUNT.labels(endpoint="price_multiple", method="GET", type="list").inc()
-    CURRENT_REQUESTS.inc()
-
     try:
         assets_param = request.args.get('assets')
         if not assets_param:
             logger.error("No assets specified")
             ERROR_COUNT.labels(endpoint="price_multiple", error_type="missing_assets").inc()
-            CURRENT_REQUESTS.dec()
             return jsonify({"error": "No assets specified"}), 400
 
-        asset_list = assets_param.split(',')
+        asset_list = _clean_assets(assets_param.split(','))
         if not asset_list:
             logger.error("Empty asset list")
             ERROR_COUNT.labels(endpoint="price_multiple", error_type="empty_list").inc()
-            CURRENT_REQUESTS.dec()
             return jsonify({"error": "Asset list cannot be empty"}), 400
-        logger.info(f"Fetching prices for assets: {asset_list}")
-        price_exec = PriceService()
-        result = await price_exec.get_prices(asset_list)
-
-        if not result:
-            logger.warning(f"No price data found for assets: {asset_list}")
+        aliases = transformer.resolve_assets(asset_list)
+        canonical_assets = list(dict.fromkeys(aliases.values()))
+        logger.info("Fetching prices for %d assets", len(canonical_assets),
+                    extra={'count': len(canonical_assets), 'endpoint': 'price_multiple'})
+        prices, failed_assets, stale_assets = await price_service.get_prices(canonical_assets)
+
+        if not prices:
+            logger.warning("No price data found for %d assets", len(asset_list))
             ERROR_COUNT.labels(endpoint="price_multiple", error_type="not_found").inc()
-            CURRENT_REQUESTS.dec()
-            return jsonify({"error": "Price data not found"}), 404
+            return jsonify({"error": "Price data not found", "failed": failed_assets}), 404
+
+        with stage('serialize'):
+            body = serialization.prices_response(prices, failed_assets, aliases, stale_assets)
 
-        REQUEST_LATENCY.labels(endpoint="price_multiple", type="list").observe(time.time() - start_time)
-        CURRENT_REQUESTS.dec()
-        return jsonify({"prices": result}), 200
+        return body, 200, serialization.price_headers(prices.values(), bool(stale_assets))
 
     except Exception as e:
         logger.error(f"Error fetching prices for assets: {e}")
         ERROR_COUNT.labels(endpoint="price_multiple", error_type="exception").inc()
-        CURRENT_REQUESTS.dec()
         return jsonify({"error": "Internal server error"}), 500
     finally:
         # Detach the trace context to clean up
         otel_context.detach(context_token)
 
 
+@app.route('/prices', methods=['POST'])
+async def price_bulk():
+    """Fetch prices for a JSON body of assets.
+
+    Body: ``{"assets": [...], "fields": [...], "format": "object" | "columnar"}``;
+    ``fields`` and ``format`` are optional.
+    """
+    trace_context = extract_trace_context(dict(request.headers))
+    context_token = otel_context.attach(trace_context)
+
+    try:
+        payload = await request.get_json(force=True, silent=True)
+        error = _bulk_request_error(payload)
+        if error:
+            logger.error(f"Invalid bulk price request: {error}")
+            ERROR_COUNT.labels(endpoint="price_bulk", error_type="invalid_input").inc()
+            return jsonify({"error": error}), 400
+
+        asset_list = _clean_assets(payload['assets'])
+        fields = payload.get('fields')
+        aliases = transformer.resolve_assets(asset_list)
+        canonical_assets = list(dict.fromkeys(aliases.values()))
+        logger.info("Fetching prices for %d assets", len(canonical_assets),
+                    extra={'count': len(canonical_assets), 'endpoint': 'price_bulk'})
+        prices, failed_assets, stale_assets = await price_service.get_prices(canonical_assets)
+
+        if not prices:
+            logger.warning("No price data found for %d assets", len(asset_list))
+            ERROR_COUNT.labels(endpoint="price_bulk", error_type="not_found").inc()
+            return jsonify({"error": "Price data not found", "failed": failed_assets}), 404
+
+        with stage('serialize'):
+            if payload.get('format') == 'columnar':
+                body = serialization.prices_columnar_response(
+                    prices, failed_assets, aliases, stale_assets, fields or serialization.PRICE_FIELDS)
+            else:
+                body = serialization.prices_response(prices, failed_assets, aliases, stale_assets, fields)
+
+        return body, 200, serialization.price_headers(prices.values(), bool(stale_assets))
+
+    except Exception as e:
+        logger.error(f"Error fetching bulk prices: {e}")
+        ERROR_COUNT.labels(endpoint="price_bulk", error_type="exception").inc()
+        return jsonify({"error": "Internal server error"}), 500
+    finally:
+        otel_context.detach(context_token)
+
+
+@app.route('/stream/prices', methods=['GET'])
+async def price_stream_events():
+    """Server-Sent Events stream of price updates for ``?assets=a,b``.
+
+    Sends an ``aliases`` event, then a ``price`` event with the current price
+    of each asset and another whenever it changes.
+    """
+    asset_list = _clean_assets(request.args.get('assets', '').split(','))
+    if not asset_list or len(asset_list) > MAX_BULK_ASSETS:
+        logger.error("Invalid asset list for price stream")
+        ERROR_COUNT.labels(endpoint="price_stream", error_type="invalid_input").inc()
+        return jsonify({"error": f"Specify between 1 and {MAX_BULK_ASSETS} assets"}), 400
+
+    aliases = transformer.resolve_assets(asset_list)
+    try:
+        subscriber = price_stream.subscribe(aliases.values())
+    except price_stream.StreamFull as e:
+        logger.error(f"Rejecting price stream: {e}")
+        ERROR_COUNT.labels(endpoint="price_stream", error_type="too_many_streams").inc()
+        return jsonify({"error": "Too many open price streams"}), 503
+
+    async def events():
+        try:
+            yield b'event: aliases\ndata: ' + serialization.dumps(aliases) + b'\n\n'
+            while True:
+                updates = await subscriber.updates(STREAM_KEEPALIVE_SECONDS)
+                if updates is None:
+                    break
+                if not updates:
+                    yield b': keepalive\n\n'
+                for update in updates.values():
+                    yield b'event: price\ndata: ' + serialization.price_event(update.record, update.stale) + b'\n\n'
+        finally:
+            price_stream.unsubscribe(subscriber)
+
+    response = await make_response(events(), 200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream
+        'X-Accel-Buffering': 'no',
+    })
+    response.timeout = None
+    return response
+
+
+def _clean_assets(assets: List[str]) -> List[str]:
+    """Trim whitespace and drop empty and repeated entries, keeping request order."""
+    return list(dict.fromkeys(asset.strip() for asset in assets if asset.strip()))
+
+
+def _bulk_request_error(payload) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return "Request body must be a JSON object"
+    assets = payload.get('assets')
+    if not isinstance(assets, list) or not all(isinstance(asset, str) for asset in assets):
+        return "'assets' must be a list of strings"
+    if not _clean_assets(assets):
+        return "Asset list cannot be empty"
+    if len(assets) > MAX_BULK_ASSETS:
+        return f"At most {MAX_BULK_ASSETS} assets per request"
+    fields = payload.get('fields')
+    if fields is not None and (not isinstance(fields, list) or not fields
+                               or not all(field in serialization.PRICE_FIELDS for field in fields)):
+        return f"'fields' must be a non-empty list of {list(serialization.PRICE_FIELDS)}"
+    if payload.get('format', 'object') not in _BULK_FORMATS:
+        return f"'format' must be one of {list(_BULK_FORMATS)}"
+    return None
+
+
+async def prefetch_hot_assets():
+    """Scheduled job: bulk-load the hot assets into this worker's price snapshot."""
+    with SCHEDULER_TASK_DURATION.time():
+        try:
+            loaded = await price_snapshot.refresh()
+            if loaded:
+                SCHEDULER_TASK_SUCCESS.inc()
+        except Exception as e:
+            logger.error(f"Error prefetching hot assets: {e}")
+            ERROR_COUNT.labels(endpoint="scheduler", error_type="prefetch_failure").inc()
+
+
+async def save_last_known_good():
+    """Scheduled job: persist this worker's last-known-good prices for the next restart."""
+    try:
+        await last_known_good.save()
+    except Exception as e:
+        logger.error(f"Error saving last-known-good prices: {e}")
+        ERROR_COUNT.labels(endpoint="scheduler", error_type="lkg_save_failure").inc()
+
+
 @app.before_serving
 async def startup():
+    global price_service, scheduler
+    # Outside the try below: an incompatible shared library must stop the worker
+    redis_cache_service.check_shared_library()
+    price_service = PriceService()
     try:
+        if scheduler is None:
+            from apscheduler.schedulers.asyncio import AsyncIOScheduler
+            scheduler = AsyncIOScheduler()
         config.set_log_levels()
+        last_known_good.load()
+        if price_snapshot.PREFETCH_INTERVAL > 0:
+            scheduler.add_job(prefetch_hot_assets, 'interval', seconds=price_snapshot.PREFETCH_INTERVAL,
+                              id='prefetch_hot_assets', next_run_time=datetime.now(),
+                              max_instances=1, coalesce=True)
+        if ALIASES_RELOAD_INTERVAL > 0:
+            scheduler.add_job(transformer.reload_if_changed, 'interval', seconds=ALIASES_RELOAD_INTERVAL,
+                              id='reload_asset_aliases', max_instances=1, coalesce=True)
+        if last_known_good.LKG_PATH and last_known_good.SAVE_INTERVAL > 0:
+            scheduler.add_job(save_last_known_good, 'interval', seconds=last_known_good.SAVE_INTERVAL,
+                              id='save_last_known_good', max_instances=1, coalesce=True)
+        if LOOP_LAG_PROBE_INTERVAL > 0:
+            scheduler.add_job(probe_event_loop_lag, 'interval', seconds=LOOP_LAG_PROBE_INTERVAL,
+                              id='probe_event_loop_lag', max_instances=1, coalesce=True)
         scheduler.start()
         logger.info(f"Scheduler started")
+        redis_cache_service.start_invalidation_listener()
         jobs = scheduler.get_jobs()
         job_list = [{'id': job.id, 'next_run_time': str(job.next_run_time), 'trigger': str(job.trigger)} for job in
                     jobs]
@@ -221,5 +381,22 @@ async def startup():
         ERROR_COUNT.labels(endpoint="startup", error_type="scheduler_failure").inc()
 
 
+@app.after_serving
+async def shutdown():
+    try:
+        if scheduler is not None and scheduler.running:
+            scheduler.shutdown(wait=False)
+        await save_last_known_good()
+        price_stream.close_all()
+        metrics_middleware.flush()
+        metrics_export.mark_worker_exited()
+        await redis_cache_service.stop_invalidation_listener()
+        await redis_cache_service.close_redis_client()
+        logger.info("Redis client closed")
+    except Exception as e:
+        logger.error(f"An error occurred during shutdown: {e}")
+        ERROR_COUNT.labels(endpoint="shutdown", error_type="redis_close_failure").inc()
+
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=8080)
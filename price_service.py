@@ -1,64 +1,202 @@
 import asyncio
 import logging
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Optional, Tuple
 
-from cryptofund20x_misc.custom_formatter import CustomFormatter
 from prometheus_client import Counter, Histogram
 
-from pricing import redis_cache_service
+from pricing import last_known_good, logging_setup, price_snapshot, redis_cache_service, staleness
+from pricing.instrumentation import stage
+from pricing.price_record import PriceRecord
 
 # Metrics
 PRICE_SERVICE_FAILURE = Counter('price_service_complete_batch_failures_total',
                                 'Number of times all APIs failed for a batch', ['type'])
 PRICE_SERVICE_REQUEST_TIME = Histogram('price_service_request_duration_seconds',
                                        'Time spent processing complete request')
+PRICE_SERVICE_BATCH_TIMEOUTS = Counter('price_service_batch_timeouts_total',
+                                       'Number of assets dropped from a batch for missing its deadline')
+PRICE_SERVICE_STALE_SERVED = Counter('price_service_stale_served_total',
+                                     'Number of prices served from last-known-good data during a Redis outage',
+                                     ['type'])
+PRICE_SERVICE_BATCH_SIZE = Histogram('price_service_batch_size', 'Number of distinct assets per batch request',
+                                     buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000))
+# Where each requested price came from; the hit ratio is snapshot + cache over all
+PRICE_SERVICE_LOOKUPS = Counter('price_service_lookups_total', 'Price lookups by the layer that answered them',
+                                ['source'])
+_SNAPSHOT_HITS = PRICE_SERVICE_LOOKUPS.labels('snapshot')
+_CACHE_HITS = PRICE_SERVICE_LOOKUPS.labels('cache')
+_FALLBACK_HITS = PRICE_SERVICE_LOOKUPS.labels('last_known_good')
+_LOOKUP_MISSES = PRICE_SERVICE_LOOKUPS.labels('miss')
+
+# Batch fan-out: misses are fetched in pipelined chunks, at most
+# _BATCH_CONCURRENCY chunks in flight per request. Chunks still running at
+# the deadline are reported as failed. They are left to finish (bounded by
+# REDIS_SOCKET_TIMEOUT) rather than cancelled mid-command, and still warm the
+# L1 cache.
+_BATCH_CHUNK_SIZE = int(os.environ.get('PRICE_BATCH_CHUNK_SIZE', 50))
+_BATCH_CONCURRENCY = int(os.environ.get('PRICE_BATCH_CONCURRENCY', 4))
+_BATCH_DEADLINE = float(os.environ.get('PRICE_BATCH_DEADLINE_SECONDS', 2.0))
+
+
+# Setup logging (once per process; PriceService instances share this logger)
+logger = logging.getLogger("PriceService")
+logging_setup.configure_logger(logger)
 
 
 class PriceService:
     def __init__(self):
-        # Setup logging
-        self.logger = logging.getLogger("PriceService")
-        handler = logging.StreamHandler()
-        handler.setFormatter(CustomFormatter())
-        self.logger.addHandler(handler)
-
-    async def get_prices(self, assets: List[str]) -> tuple[dict[str, dict], list[str | tuple[Any, str]]] | tuple[
-        Any, list[tuple[Any, str]]]:
-        """Get prices for a list of assets with fallback and error handling."""
+        self.logger = logger
+
+    async def get_prices(self, assets: List[str]) -> Tuple[Dict[str, PriceRecord], List[str], List[str]]:
+        """Get prices for a list of assets with fallback and error handling.
+
+        Returns ``(prices, failed_assets, stale_assets)``. Stale assets are
+        past their staleness policy's max age (action "flag"), or were served
+        from last-known-good data because Redis was unavailable.
+        """
         with PRICE_SERVICE_REQUEST_TIME.time():
             result_list = {}
             failed_assets = []
+            stale_assets = []
+
+            PRICE_SERVICE_BATCH_SIZE.observe(len(assets))
+            # A snapshot entry past its max age counts as a miss: Redis may have
+            # been rewritten since the last prefetch, so the policy is applied
+            # to what Redis returns instead.
+            cached_prices = {}
+            misses = []
+            for asset in dict.fromkeys(assets):
+                cached_data = price_snapshot.get(asset)
+                if cached_data is not None and staleness.action_for(cached_data) == staleness.ACCEPT:
+                    cached_prices[asset] = cached_data
+                else:
+                    misses.append(asset)
+            _SNAPSHOT_HITS.inc(len(assets) - len(misses))
+            fetched = {}
+            if misses:
+                with stage('batch_fetch'):
+                    fetched = await self._fetch_batch(misses)
+                cached_prices.update(fetched)
+                _CACHE_HITS.inc(sum(1 for cached_data in fetched.values() if cached_data))
+            missed_deadline = set(misses).difference(fetched)
+            redis_unavailable = redis_cache_service.redis_unavailable()
+            served = []
 
             for asset in assets:
-                cached_data = await redis_cache_service.get_cached_price_async(asset)
-                if cached_data:
-                    self.logger.info(f"Found cached price for {asset}")
+                cached_data = cached_prices.get(asset)
+                action = staleness.action_for(cached_data) if cached_data else staleness.REJECT
+                if action != staleness.REJECT:
+                    if logging_setup.sample_asset_log():
+                        self.logger.info("Found cached price for %s", asset, extra={'asset': asset})
+                    staleness.observe_served(cached_data)
                     result_list[asset] = cached_data
+                    served.append(cached_data)
+                    if action == staleness.FLAG:
+                        stale_assets.append(asset)
+                    continue
+                rejected_stale = cached_data is not None
+                cached_data = None
+                if redis_unavailable or asset in missed_deadline:
+                    cached_data = last_known_good.get(asset)
+                if cached_data and staleness.action_for(cached_data) != staleness.REJECT:
+                    staleness.observe_served(cached_data)
+                    PRICE_SERVICE_STALE_SERVED.labels('batch').inc()
+                    _FALLBACK_HITS.inc()
+                    result_list[asset] = cached_data
+                    stale_assets.append(asset)
                 else:
-                    self.logger.error(f"Asset {asset} not found in redis cache in batch mode")
+                    if rejected_stale:
+                        staleness.observe_rejected()
+                    self.logger.error("Asset %s not found in redis cache in batch mode", asset, extra={'asset': asset})
                     PRICE_SERVICE_FAILURE.labels('batch').inc()
+                    _LOOKUP_MISSES.inc()
                     failed_assets.append(asset)
 
+            price_snapshot.record_requests(cached_data.asset for cached_data in served)
+            last_known_good.remember(served)
+
             if failed_assets:
-                self.logger.error(f"Failed assets: {failed_assets}")
+                self.logger.error("Failed assets: %s", failed_assets, extra={'assets': failed_assets})
+            if stale_assets:
+                self.logger.warning("Served stale prices for %d assets", len(stale_assets),
+                                    extra={'assets': stale_assets})
 
-            return result_list, failed_assets
+            return result_list, failed_assets, stale_assets
 
-    async def get_single_price(self, asset: str) -> dict | tuple[None, str]:
-        """Get price for a single asset with fallback and error handling."""
+    async def _fetch_batch(self, assets: List[str]) -> Dict[str, Optional[PriceRecord]]:
+        semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+        expired = False
+
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Optional[PriceRecord]]:
+            async with semaphore:
+                if expired:
+                    return {}
+                return await redis_cache_service.get_cached_prices_async(chunk)
+
+        chunks = [assets[i:i + _BATCH_CHUNK_SIZE] for i in range(0, len(assets), _BATCH_CHUNK_SIZE)]
+        tasks = [asyncio.ensure_future(fetch_chunk(chunk)) for chunk in chunks]
+        done, pending = await asyncio.wait(tasks, timeout=_BATCH_DEADLINE)
+
+        results = {}
+        for task in done:
+            if task.exception() is None:
+                results.update(task.result())
+            else:
+                self.logger.error("Error fetching batch chunk: %s", task.exception())
+        if pending:
+            expired = True
+            for task in pending:
+                task.add_done_callback(_consume_result)
+            timed_out = len(assets) - len(results)
+            PRICE_SERVICE_BATCH_TIMEOUTS.inc(timed_out)
+            self.logger.error("%d assets missed the %.2fs batch deadline", timed_out, _BATCH_DEADLINE)
+        return results
+
+    async def get_single_price(self, asset: str) -> Tuple[Optional[PriceRecord], bool]:
+        """Get price for a single asset with fallback and error handling.
+
+        Returns ``(record, stale)``; ``stale`` is True when the record is past
+        its staleness policy's max age (action "flag") or came from
+        last-known-good data because Redis was unavailable.
+        """
         with PRICE_SERVICE_REQUEST_TIME.time():
-            self.logger.info(f"Fetching single price for {asset}")
+            rejected_stale = False
             try:
-                cached_data = await redis_cache_service.get_cached_price_async(asset)
-                if cached_data:
-                    self.logger.info(f"Found cached price for {asset}")
-                    return cached_data
+                cached_data = price_snapshot.get(asset)
+                if cached_data is not None and staleness.action_for(cached_data) == staleness.ACCEPT:
+                    _SNAPSHOT_HITS.inc()
                 else:
-                    self.logger.error(f"Didn't find price for  {asset} in redis cache")
-                    PRICE_SERVICE_FAILURE.labels('single').inc()
-                    raise ValueError(f"Asset {asset} not found in redis cache")
+                    with stage('redis_lookup'):
+                        cached_data = await redis_cache_service.get_cached_price_async(asset)
+                    if cached_data is not None:
+                        _CACHE_HITS.inc()
+                action = staleness.action_for(cached_data) if cached_data else staleness.REJECT
+                if action != staleness.REJECT:
+                    if logging_setup.sample_asset_log():
+                        self.logger.info("Found cached price for %s", asset, extra={'asset': asset})
+                    staleness.observe_served(cached_data)
+                    price_snapshot.record_requests([asset])
+                    last_known_good.remember([cached_data])
+                    return cached_data, action == staleness.FLAG
+                rejected_stale = cached_data is not None
             except Exception as e:
-                self.logger.error(f"Error fetching price for {asset}: {str(e)}")
+                self.logger.error("Error fetching price for %s: %s", asset, e, extra={'asset': asset})
+
+            if redis_cache_service.redis_unavailable():
+                cached_data = last_known_good.get(asset)
+                if cached_data and staleness.action_for(cached_data) != staleness.REJECT:
+                    staleness.observe_served(cached_data)
+                    self.logger.warning("Serving last-known-good price for %s", asset, extra={'asset': asset})
+                    PRICE_SERVICE_STALE_SERVED.labels('single').inc()
+                    _FALLBACK_HITS.inc()
+                    return cached_data, True
+            if rejected_stale:
+                staleness.observe_rejected()
+            self.logger.error("Didn't find price for %s in redis cache", asset, extra={'asset': asset})
+            PRICE_SERVICE_FAILURE.labels('single').inc()
+            _LOOKUP_MISSES.inc()
+            return None, False
 
     @staticmethod
     def _create_result_dict(asset: str, price: float, volume: float, marketcap: float) -> Dict:
@@ -70,8 +208,14 @@ class PriceService:
         }
 
 
+def _consume_result(task: asyncio.Future) -> None:
+    # Retrieve the outcome of an abandoned chunk so asyncio does not warn about it
+    if not task.cancelled():
+        task.exception()
+
+
 if __name__ == '__main__':
     pr = PriceService()
-    result = asyncio.run(pr.get_single_price("sdai"))
+    result, stale = asyncio.run(pr.get_single_price("sdai"))
     print(result)
-    print(f"asset: {result['asset']}\t usd_price: {result['usd_price']}")
+    print(f"asset: {result.asset}\t usd_price: {result.usd_price}")
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from opentelemetry import trace
+from prometheus_client import Gauge, Histogram
+
+# Per-stage timing for the request path. Each stage is observed in
+# STAGE_LATENCY and wrapped in an OpenTelemetry span, which becomes a child of
+# the request's trace when price_app has attached an incoming context.
+STAGE_LATENCY = Histogram('price_stage_duration_seconds', 'Time spent in each stage of the price request path',
+                          ['stage'],
+                          buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+
+# How long a callback waits for the event loop, sampled by probe_event_loop_lag().
+# Sustained lag means a worker is CPU-bound and more workers would help.
+EVENT_LOOP_LAG = Histogram('event_loop_lag_seconds', 'Delay before a ready callback runs on the event loop',
+                           buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+EVENT_LOOP_LAG_LAST = Gauge('event_loop_lag_last_seconds', 'Most recent event loop lag sample, per worker',
+                            multiprocess_mode='liveall')
+
+tracer = trace.get_tracer("pricing")
+
+# Label children by stage, so the hot path skips labels()' lookup and lock
+_stage_histograms: Dict[str, Histogram] = {}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    histogram = _stage_histograms.get(name)
+    if histogram is None:
+        histogram = _stage_histograms[name] = STAGE_LATENCY.labels(name)
+    with tracer.start_as_current_span(name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+
+async def probe_event_loop_lag() -> float:
+    """Scheduled job: time a yield back onto the loop, i.e. how long ready callbacks are queued."""
+    started = time.perf_counter()
+    await asyncio.sleep(0)
+    lag = time.perf_counter() - started
+    EVENT_LOOP_LAG.observe(lag)
+    EVENT_LOOP_LAG_LAST.set(lag)
+    return lag
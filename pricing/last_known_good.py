@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+from pricing import logging_setup
+from pricing.price_record import PriceRecord
+from pricing.serialization import dumps
+
+# Per-worker store of the last price served for each asset. When Redis is
+# unreachable the price endpoints answer from it and mark the response stale,
+# instead of failing. PRICE_LKG_PATH persists it to a local file (written by a
+# scheduler job in price_app) so a restarted worker can warm up from disk.
+LKG_PATH = os.environ.get('PRICE_LKG_PATH')
+SAVE_INTERVAL = float(os.environ.get('PRICE_LKG_SAVE_SECONDS', 60))
+_MAX_ENTRIES = int(os.environ.get('PRICE_LKG_MAX_ENTRIES', 5000))
+
+_records: Dict[str, PriceRecord] = {}
+
+# Setup logging
+logger = logging.getLogger("last_known_good")
+logging_setup.configure_logger(logger)
+
+
+def remember(records: Iterable[PriceRecord]) -> None:
+    """Keep ``records`` as the latest known prices; the least recently updated go first when full."""
+    for record in records:
+        # Re-insert so dict order tracks the last update
+        _records.pop(record.asset, None)
+        _records[record.asset] = record
+    while len(_records) > _MAX_ENTRIES:
+        del _records[next(iter(_records))]
+
+
+def get(asset: str) -> Optional[PriceRecord]:
+    return _records.get(asset)
+
+
+def clear() -> None:
+    _records.clear()
+
+
+def load(path: Optional[str] = LKG_PATH) -> int:
+    """Warm the store from ``path``. Returns the number of records loaded.
+
+    A missing or unreadable file is logged and leaves the store empty; the
+    worker then starts with no fallback, as it would without persistence.
+    """
+    if not path:
+        return 0
+    try:
+        with open(path, 'rb') as f:
+            hashes = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading last-known-good prices from {path}: {e}")
+        return 0
+
+    records = []
+    for asset, cached_data in hashes.items():
+        try:
+            records.append(PriceRecord.from_hash(asset, cached_data))
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping last-known-good price for {asset}: {e}")
+    # Newer entries in the store (served since startup) take precedence
+    fresh = [record for record in records if record.asset not in _records]
+    current = list(_records.values())
+    _records.clear()
+    remember(fresh)
+    remember(current)
+    logger.info(f"Loaded {len(fresh)} last-known-good prices from {path}")
+    return len(fresh)
+
+
+def _write(path: str, body: bytes) -> None:
+    # Write beside the target and rename, so a reader (or a crash) never sees a
+    # partial file. Workers share the path; the last writer wins.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+async def save(path: Optional[str] = LKG_PATH) -> int:
+    """Persist the store to ``path`` off the event loop. Returns the number of records written."""
+    if not path or not _records:
+        return 0
+    # Stored in the same shape as the Redis hash so load() reuses PriceRecord.from_hash
+    body = dumps({asset: record.to_dict() for asset, record in _records.items()})
+    await asyncio.get_running_loop().run_in_executor(None, _write, path, body)
+    return len(_records)
@@ -0,0 +1,113 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, Optional
+
+from cryptofund20x_misc.custom_formatter import CustomFormatter
+
+# Log records from the request path are put on an in-memory queue and written
+# to stderr by a QueueListener thread, so a slow stderr never blocks the event
+# loop. LOG_QUEUE_ENABLED=false writes synchronously, as before.
+_QUEUE_ENABLED = os.environ.get('LOG_QUEUE_ENABLED', 'true').lower() == 'true'
+# LOG_FORMAT=json emits one JSON object per line (structured fields such as
+# asset are taken from the record's ``extra``); anything else keeps CustomFormatter.
+_LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+# Fraction of per-asset request-path lines that are emitted (0 silences them).
+PER_ASSET_LOG_SAMPLE_RATE = float(os.environ.get('PER_ASSET_LOG_SAMPLE_RATE', 0.01))
+
+_STRUCTURED_FIELDS = ('asset', 'assets', 'count', 'endpoint', 'otelTraceID', 'otelSpanID')
+
+_log_queue = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in _STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                payload[field] = getattr(record, field)
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted before the record was queued; see _QueueHandler
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback apart from the message.
+
+    The stock prepare() folds the traceback into the message and clears
+    exc_info, so JsonFormatter could not emit it as its own field. Here the
+    traceback is formatted to ``exc_text`` up front (a queued exc_info
+    would keep the request's frames alive), and formatters append it or
+    emit it as-is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _stream_handler() -> logging.Handler:
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if _LOG_FORMAT == 'json' else CustomFormatter())
+    return stream_handler
+
+
+def _start_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_log_queue, _stream_handler(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_listener)
+
+
+def stop_listener() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logger(logger: logging.Logger, filters: Iterable[logging.Filter] = ()) -> logging.Logger:
+    """Attach this process's output handler to ``logger``.
+
+    Filters run in the calling thread, so context-dependent ones (trace ids)
+    still see the request's context when records are queued.
+    """
+    if _QUEUE_ENABLED:
+        _start_listener()
+        log_handler = _QueueHandler(_log_queue)
+    else:
+        log_handler = _stream_handler()
+    for log_filter in filters:
+        log_handler.addFilter(log_filter)
+    logger.addHandler(log_handler)
+    return logger
+
+
+def sample_asset_log() -> bool:
+    """Whether to emit the next per-asset request-path line."""
+    return PER_ASSET_LOG_SAMPLE_RATE > 0 and random.random() < PER_ASSET_LOG_SAMPLE_RATE
@@ -0,0 +1,115 @@
+import glob
+import os
+import re
+import threading
+import time
+from typing import Optional, Set
+
+from prometheus_client import REGISTRY, CollectorRegistry, ProcessCollector, generate_latest, multiprocess
+
+# The one exposition path: metrics_server.py in multiprocess mode, where it
+# serves the aggregate of every worker's files (price_app's /metrics answers
+# 404 there), or price_app's /metrics in a single process. The rendered
+# output is reused for METRICS_CACHE_SECONDS, so back-to-back scrapes do not
+# re-read every .db file.
+METRICS_CACHE_SECONDS = float(os.environ.get('METRICS_CACHE_SECONDS', 2.0))
+# How often to look for files left by workers that have exited
+_DEAD_PID_SCAN_SECONDS = 30.0
+
+_PID_FILE = re.compile(r'_(\d+)\.db$')
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_dead_workers(path: str) -> Set[int]:
+    """Drop the gauge files of worker processes that no longer exist.
+
+    mark_process_dead() removes the live* gauges; gauges in the default
+    "all" mode are removed too, as a per-pid series for a dead worker (e.g.
+    current_requests) only misleads. Counter and histogram files are kept so
+    the aggregated totals do not go backwards. Returns the dead pids found.
+    """
+    dead = set()
+    for db_file in glob.glob(os.path.join(path, 'gauge_*.db')):
+        match = _PID_FILE.search(db_file)
+        if match and not _pid_alive(int(match.group(1))):
+            dead.add(int(match.group(1)))
+    for pid in dead:
+        _remove_gauges(pid, path)
+    return dead
+
+
+def _remove_gauges(pid: int, path: str) -> None:
+    try:
+        multiprocess.mark_process_dead(pid, path)
+        for db_file in glob.glob(os.path.join(path, f'gauge_all_{pid}.db')):
+            os.remove(db_file)
+    except OSError:
+        # Another process cleaning the same directory got there first
+        pass
+
+
+def mark_worker_exited() -> None:
+    """Remove this worker's gauge files on a clean shutdown, ahead of the periodic scan."""
+    path = multiprocess_dir()
+    if path:
+        _remove_gauges(os.getpid(), path)
+
+
+def build_registry(path: Optional[str]) -> CollectorRegistry:
+    """The registry to expose: an aggregating one in multiprocess mode, else the default."""
+    if not path:
+        return REGISTRY
+    registry = CollectorRegistry()
+    ProcessCollector(registry=registry)
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return registry
+
+
+class CachedExposition:
+    """Renders ``registry`` at most once per ``ttl`` seconds; safe to call from threads."""
+
+    def __init__(self, registry: CollectorRegistry, ttl: float = METRICS_CACHE_SECONDS,
+                 multiprocess_path: Optional[str] = None):
+        self.registry = registry
+        self.ttl = ttl
+        self.multiprocess_path = multiprocess_path
+        self._lock = threading.Lock()
+        self._output = b''
+        self._rendered_at = float('-inf')
+        self._scanned_at = float('-inf')
+
+    def render(self) -> bytes:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._rendered_at >= self.ttl:
+                if self.multiprocess_path and now - self._scanned_at >= _DEAD_PID_SCAN_SECONDS:
+                    cleanup_dead_workers(self.multiprocess_path)
+                    self._scanned_at = now
+                self._output = generate_latest(self.registry)
+                self._rendered_at = now
+            return self._output
+
+
+_exposition: Optional[CachedExposition] = None
+
+
+def render() -> bytes:
+    """The current exposition for this process's configuration."""
+    global _exposition
+    if _exposition is None:
+        path = multiprocess_dir()
+        _exposition = CachedExposition(build_registry(path), multiprocess_path=path)
+    return _exposition.render()
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from collections import Counter as Tally
+from typing import NamedTuple, Optional, Sequence
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request counts are tallied in memory and written to the metric at most once
+# per METRICS_FLUSH_SECONDS; in multiprocess mode every inc() is a locked
+# write to an mmap'd file. 0 writes on every request.
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1.0))
+
+
+class Route(NamedTuple):
+    method: str
+    path: str
+    endpoint: str
+    type: str
+    # Match every path under ``path`` (e.g. /price/<asset>) rather than exactly
+    prefix: bool = False
+    # Long-lived responses (streams) are counted but not timed or held in the in-progress gauge
+    timed: bool = True
+
+
+class _Accounting(NamedTuple):
+    count: Counter
+    latency: Optional[Histogram]
+
+
+class MetricsMiddleware:
+    """ASGI middleware that does the per-request metric accounting for ``routes``.
+
+    Counts, in-progress requests and latency are recorded once per request,
+    in a ``finally`` so error paths cannot leak the in-progress gauge. Label
+    children are resolved once per route. Requests to other paths pass
+    through untouched.
+    """
+
+    def __init__(self, app, routes: Sequence[Route], request_count: Counter, current_requests: Gauge,
+                 request_latency: Histogram, flush_interval: float = METRICS_FLUSH_SECONDS):
+        self.app = app
+        self.current_requests = current_requests
+        self.flush_interval = flush_interval
+        self._routes = [
+            (route, _Accounting(
+                request_count.labels(endpoint=route.endpoint, method=route.method, type=route.type),
+                request_latency.labels(endpoint=route.endpoint, type=route.type) if route.timed else None))
+            for route in routes
+        ]
+        self._pending = Tally()
+        self._in_progress = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def _match(self, method: str, path: str) -> Optional[_Accounting]:
+        for route, accounting in self._routes:
+            if route.method == method and (path.startswith(route.path) if route.prefix else path == route.path):
+                return accounting
+        return None
+
+    async def __call__(self, scope, receive, send):
+        accounting = self._match(scope['method'], scope['path']) if scope['type'] == 'http' else None
+        if accounting is None:
+            return await self.app(scope, receive, send)
+
+        self._pending[accounting.count] += 1
+        if accounting.latency is None:
+            self._schedule_flush()
+            return await self.app(scope, receive, send)
+
+        self._in_progress += 1
+        self._schedule_flush()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            accounting.latency.observe(time.perf_counter() - started)
+            self._in_progress -= 1
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self.flush_interval <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        """Write the tallied counts and the in-progress gauge to the metrics."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for count, requests in self._pending.items():
+            count.inc(requests)
+        self._pending.clear()
+        self.current_requests.set(self._in_progress)
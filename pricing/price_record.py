@@ -0,0 +1,66 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional
+
+from pricing.serialization import dumps
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class PriceRecord:
+    """A parsed ``price:<asset>`` hash as written by PricePopulator.
+
+    The hash is parsed once when it is read from Redis; the record is then
+    shared by the L1 cache, the hot-asset snapshot and every response.
+    """
+    asset: str
+    usd_price: float
+    volume_last_24_hours: Optional[float]
+    current_marketcap_usd: Optional[float]
+    # Epoch seconds, for cheap age checks
+    timestamp: float
+    # The timestamp exactly as stored (naive local ISO-8601), echoed in responses
+    updated_at: str
+    # Encoded to_dict(), filled in on first use by to_json()
+    _json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_hash(cls, asset: str, cached_data: Dict[str, str]) -> 'PriceRecord':
+        """Parse a decoded Redis hash. Raises ValueError if the price or timestamp is unusable."""
+        usd_price = cached_data.get('usd_price')
+        updated_at = cached_data.get('timestamp')
+        if usd_price is None or not updated_at:
+            raise ValueError(f"Cached price for {asset} is missing usd_price or timestamp")
+        return cls(
+            asset=asset,
+            usd_price=float(usd_price),
+            volume_last_24_hours=_optional_float(cached_data.get('volume_last_24_hours')),
+            current_marketcap_usd=_optional_float(cached_data.get('current_marketcap_usd')),
+            timestamp=datetime.fromisoformat(updated_at).timestamp(),
+            updated_at=updated_at,
+        )
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since PricePopulator wrote this price."""
+        return (time.time() if now is None else now) - self.timestamp
+
+    def to_dict(self) -> Dict:
+        return {
+            "usd_price": self.usd_price,
+            "volume_last_24_hours": self.volume_last_24_hours,
+            "current_marketcap_usd": self.current_marketcap_usd,
+            "timestamp": self.updated_at,
+        }
+
+    def to_json(self) -> bytes:
+        """to_dict() as JSON bytes, encoded once per record."""
+        if self._json is None:
+            object.__setattr__(self, '_json', dumps(self.to_dict()))
+        return self._json
@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+
+from pricing import last_known_good, logging_setup, redis_cache_service
+from pricing.price_record import PriceRecord
+
+# Per-worker snapshot of hot assets, bulk-loaded from Redis by a scheduler job
+# in price_app. The hot set is PRICE_PREFETCH_ASSETS plus the most requested
+# assets seen by this worker. An interval of 0 disables the job.
+PREFETCH_INTERVAL = float(os.environ.get('PRICE_PREFETCH_INTERVAL_SECONDS', 60))
+_STATIC_ASSETS = [a.strip() for a in os.environ.get('PRICE_PREFETCH_ASSETS', '').split(',') if a.strip()]
+_TOP_N = int(os.environ.get('PRICE_PREFETCH_TOP_N', 50))
+# A snapshot the job has not refreshed for this long is ignored, so a stalled
+# job degrades to plain Redis lookups instead of serving old data.
+_MAX_AGE = float(os.environ.get('PRICE_PREFETCH_MAX_AGE_SECONDS', 3 * PREFETCH_INTERVAL))
+
+_snapshot: Dict[str, PriceRecord] = {}
+_loaded_at = 0.0
+_request_counts = Counter()
+
+# Setup logging
+logger = logging.getLogger("price_snapshot")
+logging_setup.configure_logger(logger)
+
+
+def invalidate(asset: str) -> None:
+    """Drop ``asset`` so the next lookup reads the updated hash from Redis."""
+    _snapshot.pop(asset, None)
+
+
+redis_cache_service.add_invalidation_listener(invalidate)
+
+
+def get(asset: str) -> Optional[PriceRecord]:
+    """Return the snapshot entry for ``asset``, or None on a miss or an expired snapshot.
+
+    Expired entries are still in last_known_good, which serves them (marked
+    stale) if Redis is down.
+    """
+    if not _snapshot or (time.monotonic() - _loaded_at) >= _MAX_AGE:
+        return None
+    return _snapshot.get(asset)
+
+
+def record_requests(assets: Iterable[str]) -> None:
+    """Count lookups of assets that were found, to rank the hot set.
+
+    Only found assets are passed in, so arbitrary client input cannot grow
+    the counter without bound.
+    """
+    _request_counts.update(assets)
+
+
+def hot_assets() -> List[str]:
+    ranked = [asset for asset, _ in _request_counts.most_common(_TOP_N)]
+    return list(dict.fromkeys(_STATIC_ASSETS + ranked))
+
+
+def _decay_request_counts() -> None:
+    # Halve the counts after every refresh so the ranking follows recent traffic
+    for asset, count in list(_request_counts.items()):
+        if count > 1:
+            _request_counts[asset] = count // 2
+        else:
+            del _request_counts[asset]
+
+
+async def refresh() -> int:
+    """Reload the hot assets from Redis and swap in the new snapshot.
+
+    Returns the number of assets loaded. When nothing could be loaded the
+    previous snapshot is kept and left to expire.
+    """
+    global _snapshot, _loaded_at
+    assets = hot_assets()
+    _decay_request_counts()
+    if not assets:
+        return 0
+
+    generations = {asset: redis_cache_service.generation(asset) for asset in assets}
+    cached_prices = await redis_cache_service.get_cached_prices_async(assets)
+    if not any(cached_prices.values()):
+        logger.error(f"Prefetch loaded none of {len(assets)} hot assets; keeping previous snapshot")
+        return 0
+    # Assets updated while the read was in flight were read before the
+    # update; leave them out so lookups go to Redis instead.
+    loaded = {asset: data for asset, data in cached_prices.items()
+              if data and redis_cache_service.generation(asset) == generations[asset]}
+
+    _snapshot = loaded
+    last_known_good.remember(loaded.values())
+    _loaded_at = time.monotonic()
+    logger.info(f"Prefetched {len(loaded)}/{len(assets)} hot assets")
+    return len(loaded)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+from pricing import logging_setup, redis_cache_service, staleness
+from pricing.price_record import PriceRecord
+
+# Push price updates to long-lived subscribers (the /stream/prices endpoint).
+# One watcher task per worker reads each changed asset from Redis once and
+# fans the record out to every subscriber of that asset. Changes are picked
+# up from the invalidation listener when it is enabled, and by re-reading all
+# watched assets every PRICE_STREAM_POLL_SECONDS either way. Prices get the
+# same staleness policy as /price and /prices: rejected ones are not sent, and
+# a price that turns stale is sent again, flagged.
+POLL_INTERVAL = float(os.environ.get('PRICE_STREAM_POLL_SECONDS', 5))
+MAX_SUBSCRIBERS = int(os.environ.get('PRICE_STREAM_MAX_SUBSCRIBERS', 1000))
+
+# Metrics
+STREAM_SUBSCRIBERS = Gauge('price_stream_subscribers', 'Number of open price stream subscriptions',
+                           multiprocess_mode='livesum')
+STREAM_UPDATES = Counter('price_stream_updates_total', 'Number of price updates fanned out to subscribers')
+STREAM_COALESCED = Counter('price_stream_coalesced_updates_total',
+                           'Number of updates replaced by a newer one before a slow subscriber read them')
+
+# Setup logging
+logger = logging.getLogger("price_stream")
+logging_setup.configure_logger(logger)
+
+
+class PriceUpdate(NamedTuple):
+    record: PriceRecord
+    stale: bool
+
+
+class StreamFull(Exception):
+    """Raised by subscribe() when the worker already has MAX_SUBSCRIBERS."""
+
+
+class Subscriber:
+    """One stream client. Holds at most one pending record per asset.
+
+    A consumer that falls behind only ever sees the latest price of each
+    asset, so its memory is bounded by the assets it watches rather than by
+    how far behind it is.
+    """
+
+    def __init__(self, assets: Iterable[str]):
+        self.assets = frozenset(assets)
+        self.closed = False
+        self._pending: Dict[str, PriceUpdate] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, update: PriceUpdate) -> None:
+        asset = update.record.asset
+        if asset in self._pending:
+            STREAM_COALESCED.inc()
+        self._pending[asset] = update
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def updates(self, timeout: Optional[float] = None) -> Optional[Dict[str, PriceUpdate]]:
+        """Wait for the next batch of updates.
+
+        Returns an empty dict if ``timeout`` passes first, and None once the
+        subscription is closed.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        if self.closed:
+            return None
+        self._ready.clear()
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+_subscribers_by_asset: Dict[str, Set[Subscriber]] = {}
+_subscribers: Set[Subscriber] = set()
+# Latest update sent for each watched asset; new subscribers start from it
+_latest: Dict[str, PriceUpdate] = {}
+_dirty: Set[str] = set()
+_wakeup: Optional[asyncio.Event] = None
+_watcher_task: Optional[asyncio.Task] = None
+
+
+def subscribe(assets: Iterable[str]) -> Subscriber:
+    """Register a subscriber and queue the current price of each asset for it."""
+    global _wakeup, _watcher_task
+    if len(_subscribers) >= MAX_SUBSCRIBERS:
+        raise StreamFull(f"{MAX_SUBSCRIBERS} price stream subscribers already open")
+    subscriber = Subscriber(assets)
+    _subscribers.add(subscriber)
+    STREAM_SUBSCRIBERS.inc()
+    for asset in subscriber.assets:
+        _subscribers_by_asset.setdefault(asset, set()).add(subscriber)
+        if asset in _latest:
+            subscriber.offer(_latest[asset])
+        else:
+            _dirty.add(asset)
+
+    if _watcher_task is None or _watcher_task.done():
+        # A fresh event per watcher run; an Event is tied to the loop that first awaits it
+        _wakeup = asyncio.Event()
+        _watcher_task = asyncio.ensure_future(_watch())
+    _wakeup.set()
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber) -> None:
+    if subscriber not in _subscribers:
+        return
+    _subscribers.discard(subscriber)
+    STREAM_SUBSCRIBERS.dec()
+    for asset in subscriber.assets:
+        watchers = _subscribers_by_asset.get(asset)
+        if watchers is not None:
+            watchers.discard(subscriber)
+            if not watchers:
+                del _subscribers_by_asset[asset]
+                _latest.pop(asset, None)
+    if not _subscribers and _wakeup is not None:
+        # Let the watcher notice there is nobody left and exit
+        _wakeup.set()
+
+
+def close_all() -> None:
+    """End every open subscription, e.g. on shutdown."""
+    for subscriber in list(_subscribers):
+        subscriber.close()
+        unsubscribe(subscriber)
+
+
+def _on_price_change(asset: str) -> None:
+    if asset in _subscribers_by_asset:
+        _dirty.add(asset)
+        _wakeup.set()
+
+
+redis_cache_service.add_invalidation_listener(_on_price_change)
+
+
+def _publish(records: Dict[str, Optional[PriceRecord]]) -> None:
+    for asset, record in records.items():
+        watchers = _subscribers_by_asset.get(asset)
+        if record is None or not watchers:
+            continue
+        action = staleness.action_for(record)
+        if action == staleness.REJECT:
+            # Treated as missing, as /price does; subscribers keep their last price
+            _latest.pop(asset, None)
+            continue
+        update = PriceUpdate(record, action == staleness.FLAG)
+        previous = _latest.get(asset)
+        if previous is not None and previous.record.updated_at == record.updated_at \
+                and previous.stale == update.stale:
+            continue
+        _latest[asset] = update
+        staleness.observe_served(record)
+        STREAM_UPDATES.inc(len(watchers))
+        for subscriber in watchers:
+            subscriber.offer(update)
+
+
+async def _watch() -> None:
+    # Not cancelled from outside: a Redis command cancelled mid-flight can leave
+    # an unread reply on a pooled connection. It exits once nobody is subscribed.
+    # Wakeups only read the dirty assets; every watched asset is re-read once
+    # next_poll passes, however often new subscribers woke the watcher meanwhile.
+    next_poll = time.monotonic() + POLL_INTERVAL
+    while _subscribers:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), max(0.0, next_poll - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        if time.monotonic() >= next_poll:
+            next_poll = time.monotonic() + POLL_INTERVAL
+            assets = list(_subscribers_by_asset)
+        else:
+            assets = [asset for asset in _dirty if asset in _subscribers_by_asset]
+        _dirty.clear()
+        if not assets:
+            continue
+        try:
+            _publish(await redis_cache_service.get_cached_prices_async(assets))
+        except Exception as e:
+            logger.error(f"Error reading price updates for {len(assets)} assets: {e}")
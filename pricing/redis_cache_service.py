@@ -1,87 +1,602 @@
+import asyncio
+import functools
 import inspect
 import logging
+import os
 import time
-from datetime import datetime
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import aioredis
-from cryptofund20x_misc.custom_formatter import CustomFormatter
+from aioredis.exceptions import (
+    ConnectionError as AioredisConnectionError,
+    TimeoutError as AioredisTimeoutError,
+)
 from cryptofund20x_services.db_layer_caller import get_redis_url
+from prometheus_client import Counter, Gauge
 from redis.exceptions import (
     ConnectionError as RedisConnectionError,
     TimeoutError as RedisTimeoutError,
 )
 
-# Import-time version guard
-_sig = inspect.signature(get_redis_url)
-if 'db' not in _sig.parameters:
-    raise ImportError(
-        "Installed Cryptofund20xShared is too old: get_redis_url() "
-        "lacks 'db' parameter. Requires >= 0.9.0."
-    )
+from pricing import logging_setup, staleness
+from pricing.instrumentation import stage
+from pricing.price_record import PriceRecord
 
 # Constants
 PRICE_KEY_PREFIX = "price:"
 
+# Failures that mean Redis is unreachable: they trip the circuit breaker and
+# drop the cached URL. aioredis raises its own ConnectionError (wrapping the
+# OSError) rather than redis-py's, so both families are listed.
+_NETWORK_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, AioredisConnectionError, AioredisTimeoutError)
+
 # URL cache (TTL = 300s / 5 minutes — no scheduler cadence to match;
 # service is purely request-driven)
 _cached_redis_url = None
 _cached_url_timestamp = 0.0
 _URL_TTL = 300
+# Single in-flight Consul resolution; callers holding a (stale) URL keep
+# using it while the refresh runs in the default executor.
+_url_refresh_task = None
+
+# Shared client (one bounded connection pool per worker process). Rebuilt when
+# the resolved URL changes or after _invalidate_url_cache() drops it.
+_redis_client = None
+_redis_client_url = None
+_retired_clients = []
+_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 20))
+# Per-command bound; a hung read fails with a TimeoutError instead of blocking
+_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 1.0))
+# A full pool makes callers queue this long for a free connection (a plain
+# ConnectionPool raises "Too many connections" instead)
+_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 2 * _SOCKET_TIMEOUT))
+# Retired clients whose pools may still have commands running, as
+# (retired_at, client). Only idle connections are closed until a pool has
+# had _DRAIN_SECONDS (longer than any command can take) to finish.
+_draining_clients: List[Tuple[float, Any]] = []
+_DRAIN_SECONDS = 2 * _SOCKET_TIMEOUT
+
+# In-process L1 cache in front of Redis. PricePopulator only rewrites the
+# price:* hashes every few minutes, so a few seconds of TTL is plenty.
+# A TTL of 0 disables the cache.
+_L1_TTL = float(os.environ.get('PRICE_L1_TTL_SECONDS', 5))
+_L1_MAX_ENTRIES = int(os.environ.get('PRICE_L1_MAX_ENTRIES', 512))
+
+# Push-based invalidation (opt-in). PricePopulator writes are seen either as
+# keyspace notifications (the server needs notify-keyspace-events to include
+# "Kh") or as the asset name published on PRICE_UPDATE_CHANNEL. While the
+# subscription is up, L1 entries live for _L1_SUBSCRIBED_TTL; if it drops,
+# the L1 cache is cleared and falls back to the short _L1_TTL.
+_INVALIDATION_ENABLED = os.environ.get('PRICE_INVALIDATION_ENABLED', 'false').lower() == 'true'
+PRICE_UPDATE_CHANNEL = os.environ.get('PRICE_UPDATE_CHANNEL', 'price-updates')
+_L1_SUBSCRIBED_TTL = float(os.environ.get('PRICE_L1_SUBSCRIBED_TTL_SECONDS', 300))
+_INVALIDATION_RETRY_SECONDS = 5
+_invalidation_task = None
+_invalidation_listeners: List[Callable[[str], None]] = []
+# Invalidations seen per asset. A read that started before the latest one
+# returned the old hash, so its result must not be cached.
+_generations: Dict[str, int] = {}
+
+# Redis reads in flight, by asset; identical concurrent lookups await the same one
+_in_flight: Dict[str, asyncio.Future] = {}
+
+# Circuit breaker around Redis reads: after _CIRCUIT_FAILURE_THRESHOLD
+# consecutive network failures, lookups fail fast for _CIRCUIT_RESET_SECONDS,
+# then a single probe decides whether to close it again.
+_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('REDIS_CIRCUIT_FAILURE_THRESHOLD', 5))
+_CIRCUIT_RESET_SECONDS = float(os.environ.get('REDIS_CIRCUIT_RESET_SECONDS', 10))
+
+# Metrics
+L1_CACHE_HITS = Counter('price_l1_cache_hits_total', 'Number of price lookups served from the in-process cache')
+L1_CACHE_MISSES = Counter('price_l1_cache_misses_total', 'Number of price lookups that fell through to Redis')
+L1_CACHE_EVICTIONS = Counter('price_l1_cache_evictions_total',
+                             'Number of entries evicted from the in-process cache because it was full')
+CACHE_INVALIDATIONS = Counter('price_cache_invalidations_total',
+                              'Number of assets invalidated by Redis update notifications')
+REDIS_CIRCUIT_STATE = Gauge('redis_circuit_breaker_state', 'Redis circuit breaker state (0=closed, 1=open, 2=half-open)',
+                            multiprocess_mode='liveall')
+REDIS_CIRCUIT_REJECTIONS = Counter('redis_circuit_breaker_rejections_total',
+                                   'Number of Redis lookups failed fast by the open circuit breaker')
+REDIS_COALESCED_CALLS = Counter('redis_coalesced_calls_total',
+                                'Number of price lookups that joined an identical Redis read already in flight')
 
 # Setup logging
 logger = logging.getLogger("redis_cache")
-handler = logging.StreamHandler()
-handler.setFormatter(CustomFormatter())
-logger.addHandler(handler)
+logging_setup.configure_logger(logger)
 
 
-def _invalidate_url_cache():
-    global _cached_redis_url, _cached_url_timestamp
+class _L1Cache:
+    """Bounded LRU of asset -> PriceRecord with a per-entry TTL."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, asset: str) -> Optional[PriceRecord]:
+        if self.ttl <= 0:
+            return None
+        entry = self._entries.get(asset)
+        if entry is None:
+            L1_CACHE_MISSES.inc()
+            return None
+        expires_at, cached_data = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[asset]
+            L1_CACHE_MISSES.inc()
+            return None
+        self._entries.move_to_end(asset)
+        L1_CACHE_HITS.inc()
+        return cached_data
+
+    def put(self, asset: str, cached_data: PriceRecord) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[asset] = (time.monotonic() + self.ttl, cached_data)
+        self._entries.move_to_end(asset)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            L1_CACHE_EVICTIONS.inc()
+
+    def invalidate(self, asset: str) -> None:
+        self._entries.pop(asset, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_l1_cache = _L1Cache(_L1_TTL, _L1_MAX_ENTRIES)
+
+
+class _CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self) -> None:
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.last_failure_at = None
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        REDIS_CIRCUIT_STATE.set(state)
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+            logger.info("Redis circuit half-open; probing")
+        # Half-open: let one probe through. A probe that never reports back
+        # (e.g. its task was abandoned) is replaced after reset_timeout.
+        if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Redis circuit closed")
+        self.failures = 0
+        self.probe_started_at = None
+        self.last_failure_at = None
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started_at = None
+        self.last_failure_at = time.monotonic()
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.error("Redis circuit open after %d consecutive failures", self.failures)
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+
+_circuit_breaker = _CircuitBreaker(_CIRCUIT_FAILURE_THRESHOLD, _CIRCUIT_RESET_SECONDS)
+
+
+def check_shared_library() -> None:
+    """Fail startup if the installed Cryptofund20xShared predates get_redis_url(db=...).
+
+    Called from price_app's startup rather than at import, so importing this
+    module stays cheap.
+    """
+    if 'db' not in inspect.signature(get_redis_url).parameters:
+        raise ImportError(
+            "Installed Cryptofund20xShared is too old: get_redis_url() "
+            "lacks 'db' parameter. Requires >= 0.9.0."
+        )
+
+
+def circuit_open() -> bool:
+    """True while Redis lookups are being failed fast (open or half-open)."""
+    return _circuit_breaker.is_open
+
+
+def redis_unavailable() -> bool:
+    """True while the circuit is open or the last lookup failed within the reset window.
+
+    Callers use this to tell an outage apart from an asset that is simply
+    not in Redis, before falling back to last-known-good data.
+    """
+    last_failure_at = _circuit_breaker.last_failure_at
+    return _circuit_breaker.is_open or (
+        last_failure_at is not None and time.monotonic() - last_failure_at < _circuit_breaker.reset_timeout)
+
+
+def _invalidate_url_cache(client=None):
+    """Drop the URL and retire the shared client after a network error on ``client``.
+
+    A failure on a client that has already been replaced says nothing about
+    the current one (and the URL was already re-resolved), so it is ignored.
+    """
+    global _cached_redis_url, _cached_url_timestamp, _redis_client, _redis_client_url
+    if client is not None and client is not _redis_client:
+        return
     _cached_redis_url = None
     _cached_url_timestamp = 0.0
+    # Connections in the pool may be dead; retire the client so the next
+    # lookup builds a fresh pool. Closing needs the event loop, so it is
+    # deferred to get_redis_client().
+    if _redis_client is not None:
+        _retired_clients.append(_redis_client)
+    _redis_client = None
+    _redis_client_url = None
 
 
-async def get_redis_client():
+async def _close_client(client, inuse_connections: bool = False) -> None:
+    # Unless shutting down, leave connections with a command in flight alone:
+    # that command still belongs to a request and should finish normally.
+    try:
+        await client.close()
+        await client.connection_pool.disconnect(inuse_connections=inuse_connections)
+    except Exception as e:
+        logger.warning(f"Error closing Redis client: {str(e)}")
+
+
+async def _close_retired_clients() -> None:
+    now = time.monotonic()
+    while _retired_clients:
+        client = _retired_clients.pop()
+        await _close_client(client)
+        _draining_clients.append((now, client))
+    # Connections that were busy above have since been released back to
+    # their pool; close them once the pool has drained.
+    while _draining_clients and now - _draining_clients[0][0] >= _DRAIN_SECONDS:
+        _, client = _draining_clients.pop(0)
+        await _close_client(client)
+
+
+async def _refresh_redis_url(started_at: float) -> Optional[str]:
     global _cached_redis_url, _cached_url_timestamp
+    try:
+        loop = asyncio.get_running_loop()
+        with stage('redis_url_resolve'):
+            redis_url = await loop.run_in_executor(None, functools.partial(get_redis_url, db=0))
+    except Exception as e:
+        logger.error(f"Error resolving Redis URL: {str(e)}")
+        return _cached_redis_url
+    _cached_redis_url = redis_url
+    _cached_url_timestamp = started_at
+    return redis_url
+
+
+async def _get_redis_url() -> str:
+    """Return the Redis URL without blocking the event loop on Consul.
+
+    A cold or invalidated cache waits for the (shared) resolution; an expired
+    one returns the last good URL and refreshes it in the background.
+    """
+    global _url_refresh_task
     now = time.monotonic()
-    if _cached_redis_url is None or (now - _cached_url_timestamp) >= _URL_TTL:
-        _cached_redis_url = get_redis_url(db=0)
-        _cached_url_timestamp = now
-    return aioredis.from_url(_cached_redis_url, decode_responses=True, db=0)
+    if _cached_redis_url is not None and (now - _cached_url_timestamp) < _URL_TTL:
+        return _cached_redis_url
+    if _url_refresh_task is None or _url_refresh_task.done():
+        _url_refresh_task = asyncio.ensure_future(_refresh_redis_url(now))
+    if _cached_redis_url is not None:
+        return _cached_redis_url
+    redis_url = await asyncio.shield(_url_refresh_task)
+    if redis_url is None:
+        raise RedisConnectionError("Unable to resolve Redis URL")
+    return redis_url
+
+
+async def get_redis_client():
+    global _redis_client, _redis_client_url
+    redis_url = await _get_redis_url()
+    if _redis_client is None or _redis_client_url != redis_url:
+        if _redis_client is not None:
+            _retired_clients.append(_redis_client)
+        with stage('redis_client_create'):
+            pool = aioredis.BlockingConnectionPool.from_url(redis_url, decode_responses=True, db=0,
+                                                            max_connections=_MAX_CONNECTIONS,
+                                                            timeout=_POOL_TIMEOUT,
+                                                            socket_timeout=_SOCKET_TIMEOUT)
+            _redis_client = aioredis.Redis(connection_pool=pool)
+        _redis_client_url = redis_url
+    if _retired_clients or _draining_clients:
+        await _close_retired_clients()
+    return _redis_client
+
+
+async def close_redis_client() -> None:
+    """Close the shared client and its pool. Called from Quart's after_serving."""
+    global _redis_client, _redis_client_url
+    client = _redis_client
+    _redis_client = None
+    _redis_client_url = None
+    if client is not None:
+        _retired_clients.append(client)
+    _retired_clients.extend(draining for _, draining in _draining_clients)
+    _draining_clients.clear()
+    while _retired_clients:
+        await _close_client(_retired_clients.pop(), inuse_connections=True)
+
+
+def add_invalidation_listener(callback: Callable[[str], None]) -> None:
+    """Register ``callback(asset)`` to run whenever an asset's price hash changes."""
+    _invalidation_listeners.append(callback)
+
+
+def generation(asset: str) -> int:
+    """How many times ``asset`` has been invalidated; compare before and after a read to detect a race."""
+    return _generations.get(asset, 0)
+
+
+def _invalidate_asset(asset: str) -> None:
+    _generations[asset] = _generations.get(asset, 0) + 1
+    _l1_cache.invalidate(asset)
+    # A read in flight started before the update; later lookups start their own
+    _in_flight.pop(asset, None)
+    CACHE_INVALIDATIONS.inc()
+    for callback in _invalidation_listeners:
+        callback(asset)
+
+
+def _asset_from_message(message: Dict) -> Optional[str]:
+    if message['type'] == 'pmessage':
+        # channel is "__keyspace@0__:price:<asset>"
+        _, _, key = message['channel'].partition(':')
+        if key.startswith(PRICE_KEY_PREFIX):
+            return key[len(PRICE_KEY_PREFIX):]
+    elif message['type'] == 'message':
+        return message['data'] or None
+    return None
+
+
+async def _listen_for_invalidations() -> None:
+    while True:
+        pubsub = None
+        redis_client = None
+        try:
+            redis_client = await get_redis_client()
+            pubsub = redis_client.pubsub()
+            await pubsub.psubscribe(f"__keyspace@0__:{PRICE_KEY_PREFIX}*")
+            await pubsub.subscribe(PRICE_UPDATE_CHANNEL)
+            if _L1_TTL > 0:
+                _l1_cache.ttl = _L1_SUBSCRIBED_TTL
+            logger.info(f"Subscribed to price updates on {PRICE_UPDATE_CHANNEL} and keyspace notifications")
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    asset = _asset_from_message(message)
+                    if asset:
+                        _invalidate_asset(asset)
+        except asyncio.CancelledError:
+            raise
+        except _NETWORK_ERRORS as e:
+            _invalidate_url_cache(redis_client)
+            logger.error(f"Price update subscription dropped: {str(e)}")
+        except Exception as e:
+            logger.error(f"Price update subscription dropped: {str(e)}")
+        finally:
+            # Updates may have been missed; fall back to TTL expiry
+            _l1_cache.ttl = _L1_TTL
+            _l1_cache.clear()
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception as e:
+                    logger.warning(f"Error closing price update subscription: {str(e)}")
+        await asyncio.sleep(_INVALIDATION_RETRY_SECONDS)
+
+
+def start_invalidation_listener() -> None:
+    """Start the update subscription if PRICE_INVALIDATION_ENABLED. Called from before_serving."""
+    global _invalidation_task
+    if not _INVALIDATION_ENABLED or (_invalidation_task is not None and not _invalidation_task.done()):
+        return
+    _invalidation_task = asyncio.ensure_future(_listen_for_invalidations())
 
 
-async def get_cached_price_async(asset: str) -> Optional[Dict]:
-    """Get cached price for a single asset from the hash map."""
+async def stop_invalidation_listener() -> None:
+    global _invalidation_task
+    task = _invalidation_task
+    _invalidation_task = None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def _share(asset: str, future: asyncio.Future) -> None:
+    """Publish ``future`` as the in-flight read of ``asset`` until it completes."""
+    _in_flight[asset] = future
+    future.add_done_callback(functools.partial(_forget, asset))
+
+
+def _forget(asset: str, future: asyncio.Future) -> None:
+    if _in_flight.get(asset) is future:
+        del _in_flight[asset]
+
+
+async def get_cached_price_async(asset: str) -> Optional[PriceRecord]:
+    """Get cached price for a single asset from the hash map.
+
+    Concurrent lookups of the same asset share one Redis read. The read runs
+    in its own task behind asyncio.shield, so a cancelled caller neither
+    cancels it for the others nor interrupts a command mid-flight.
+    """
+    record = _l1_cache.get(asset)
+    # An entry past its max age is re-read; Redis may hold a newer price
+    if record is not None and staleness.action_for(record) == staleness.ACCEPT:
+        return record
+    in_flight = _in_flight.get(asset)
+    if in_flight is not None:
+        REDIS_COALESCED_CALLS.inc()
+        return await asyncio.shield(in_flight)
+    task = asyncio.ensure_future(_fetch_price(asset))
+    _share(asset, task)
+    return await asyncio.shield(task)
+
+
+async def _fetch_price(asset: str) -> Optional[PriceRecord]:
+    if not _circuit_breaker.allow_request():
+        REDIS_CIRCUIT_REJECTIONS.inc()
+        return None
+
+    started_generation = generation(asset)
+    redis_client = None
     try:
-        redis_client = await get_redis_client()
+        with stage('redis_client'):
+            redis_client = await get_redis_client()
         key = f"{PRICE_KEY_PREFIX}{asset}"
-        logger.info(f"About to retrieve using key: {key}")
-        cached_data = await redis_client.hgetall(key)
+        if logging_setup.sample_asset_log():
+            logger.info("About to retrieve using key: %s", key, extra={'asset': asset})
+        with stage('redis_hgetall'):
+            cached_data = await redis_client.hgetall(key)
+        _circuit_breaker.record_success()
 
         if cached_data:
-            logger.info(f"got data: {cached_data}")
-            cached_time = datetime.fromisoformat(cached_data.get('timestamp'))
-            current_time = datetime.now()
-            time_diff = current_time - cached_time
-
-            if time_diff.total_seconds() > 3600:
-                logger.error(
-                    f"Cache item for {asset} is more than 1 hour old."
-                )
-            elif time_diff.total_seconds() > 1800:
-                logger.warning(
-                    f"Cache item for {asset} is more than 30 minutes old."
-                )
-
-            return cached_data
+            with stage('parse'):
+                record = PriceRecord.from_hash(asset, cached_data)
+            staleness.log_if_stale(record, logger)
+            if generation(asset) == started_generation:
+                _l1_cache.put(asset, record)
+            return record
         else:
-            logger.warning(f"No cached data found for {asset}.")
+            logger.warning("No cached data found for %s.", asset, extra={'asset': asset})
             return None
-    except (RedisConnectionError, RedisTimeoutError, OSError) as e:
-        _invalidate_url_cache()
-        logger.error(f"Error getting cached price for {asset}: {str(e)}")
+    except _NETWORK_ERRORS as e:
+        _circuit_breaker.record_failure()
+        _invalidate_url_cache(redis_client)
+        logger.error("Error getting cached price for %s: %s", asset, e, extra={'asset': asset})
         return None
     except Exception as e:
-        logger.error(f"Error getting cached price for {asset}: {str(e)}")
+        logger.error("Error getting cached price for %s: %s", asset, e, extra={'asset': asset})
         return None
+
+
+async def get_cached_prices_async(assets: List[str]) -> Dict[str, Optional[PriceRecord]]:
+    """Get cached prices for several assets in one pipelined round trip.
+
+    Every asset in ``assets`` is present in the returned dict; assets that are
+    missing from the cache or fail individually map to ``None``.
+    """
+    results = {}
+    unique_assets = []
+    for asset in dict.fromkeys(assets):
+        record = _l1_cache.get(asset)
+        if record is not None and staleness.action_for(record) == staleness.ACCEPT:
+            results[asset] = record
+        else:
+            unique_assets.append(asset)
+    if not unique_assets:
+        return results
+
+    # Join reads already in flight; pipeline the rest and publish a future per
+    # asset so lookups arriving meanwhile join this pipeline.
+    joined = {asset: _in_flight[asset] for asset in unique_assets if asset in _in_flight}
+    to_fetch = [asset for asset in unique_assets if asset not in joined]
+    if joined:
+        REDIS_COALESCED_CALLS.inc(len(joined))
+    if to_fetch:
+        task = asyncio.ensure_future(_fetch_prices(to_fetch))
+        loop = asyncio.get_running_loop()
+        futures = {asset: loop.create_future() for asset in to_fetch}
+        for asset, future in futures.items():
+            _share(asset, future)
+        task.add_done_callback(functools.partial(_resolve_futures, futures))
+        results.update(await asyncio.shield(task))
+    for asset, future in joined.items():
+        results[asset] = await asyncio.shield(future)
+    return results
+
+
+def _resolve_futures(futures: Dict[str, asyncio.Future], task: asyncio.Future) -> None:
+    fetched = task.result() if not task.cancelled() and task.exception() is None else {}
+    for asset, future in futures.items():
+        if not future.done():
+            future.set_result(fetched.get(asset))
+
+
+async def _fetch_prices(unique_assets: List[str]) -> Dict[str, Optional[PriceRecord]]:
+    results = {}
+    if not _circuit_breaker.allow_request():
+        REDIS_CIRCUIT_REJECTIONS.inc()
+        results.update((asset, None) for asset in unique_assets)
+        return results
+
+    started_generations = [generation(asset) for asset in unique_assets]
+    redis_client = None
+    try:
+        with stage('redis_client'):
+            redis_client = await get_redis_client()
+        pipe = redis_client.pipeline(transaction=False)
+        for asset in unique_assets:
+            pipe.hgetall(f"{PRICE_KEY_PREFIX}{asset}")
+        logger.debug("About to retrieve %d keys in one pipeline", len(unique_assets))
+        with stage('redis_pipeline'):
+            responses = await pipe.execute(raise_on_error=False)
+        _circuit_breaker.record_success()
+    except _NETWORK_ERRORS as e:
+        _circuit_breaker.record_failure()
+        _invalidate_url_cache(redis_client)
+        logger.error("Error getting cached prices for %d assets: %s", len(unique_assets), e)
+        results.update((asset, None) for asset in unique_assets)
+        return results
+    except Exception as e:
+        logger.error("Error getting cached prices for %d assets: %s", len(unique_assets), e)
+        results.update((asset, None) for asset in unique_assets)
+        return results
+
+    with stage('parse'):
+        for asset, started_generation, cached_data in zip(unique_assets, started_generations, responses):
+            if isinstance(cached_data, Exception):
+                logger.error("Error getting cached price for %s: %s", asset, cached_data, extra={'asset': asset})
+                results[asset] = None
+            elif not cached_data:
+                logger.warning("No cached data found for %s.", asset, extra={'asset': asset})
+                results[asset] = None
+            else:
+                try:
+                    record = PriceRecord.from_hash(asset, cached_data)
+                    staleness.log_if_stale(record, logger)
+                    if generation(asset) == started_generation:
+                        _l1_cache.put(asset, record)
+                    results[asset] = record
+                except Exception as e:
+                    logger.error("Error getting cached price for %s: %s", asset, e, extra={'asset': asset})
+                    results[asset] = None
+    return results
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from pricing.price_record import PriceRecord
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON encoder for the price endpoints: orjson when installed, stdlib json
+# otherwise. PRICE_JSON_BACKEND=json forces the stdlib encoder.
+_BACKEND = os.environ.get('PRICE_JSON_BACKEND', 'orjson' if orjson is not None else 'json').lower()
+if _BACKEND == 'orjson' and orjson is None:
+    _BACKEND = 'json'
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+# Per-asset fields a bulk request can select, in response order
+PRICE_FIELDS = ('usd_price', 'volume_last_24_hours', 'current_marketcap_usd', 'timestamp')
+
+
+def dumps(obj) -> bytes:
+    if _BACKEND == 'orjson':
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def price_headers(records: Iterable['PriceRecord'], stale: bool = False) -> Dict[str, str]:
+    """Response headers for the price endpoints.
+
+    ``X-Price-Age`` is the age in whole seconds of the oldest price in the
+    response; ``X-Price-Stale`` is set when any of them is last-known-good data
+    served during a Redis outage.
+    """
+    now = time.time()
+    headers = dict(JSON_HEADERS)
+    headers['X-Price-Age'] = str(max((int(record.age(now)) for record in records), default=0))
+    if stale:
+        headers['X-Price-Stale'] = 'true'
+    return headers
+
+
+def price_response(asset: str, canonical_asset: str, record: 'PriceRecord', stale: bool = False) -> bytes:
+    """Body for /price/<asset>: the request fields spliced into the record's cached JSON."""
+    head = dumps({"asset": asset, "canonical_asset": canonical_asset, "stale": stale})
+    return head[:-1] + b',' + record.to_json()[1:]
+
+
+def price_event(record: 'PriceRecord', stale: bool = False) -> bytes:
+    """Data line of a price stream event: ``{"asset": ..., "stale": ..., **record.to_dict()}``."""
+    return dumps({"asset": record.asset, "stale": stale})[:-1] + b',' + record.to_json()[1:]
+
+
+def prices_response(prices: Dict[str, 'PriceRecord'], failed: List[str], aliases: Dict[str, str],
+                    stale: List[str] = (), fields: Optional[Sequence[str]] = None) -> bytes:
+    """Body for /prices: ``{"prices": {asset: {...}}, "failed": [...], "stale": [...], "aliases": {...}}``.
+
+    Each record contributes its cached JSON fragment, so hot assets are not
+    re-encoded on every request. ``fields`` limits each price to a subset of
+    PRICE_FIELDS; those are encoded per request.
+    """
+    if fields is None:
+        members = _members(prices.items())
+    else:
+        members = (dumps(asset) + b':' + dumps(_select(record, fields)) for asset, record in prices.items())
+    return b''.join((
+        b'{"prices":{',
+        b','.join(members),
+        b'},"failed":',
+        dumps(failed),
+        b',"stale":',
+        dumps(list(stale)),
+        b',"aliases":',
+        dumps(aliases),
+        b'}',
+    ))
+
+
+def _members(items: Iterable[Tuple[str, 'PriceRecord']]) -> Iterable[bytes]:
+    for asset, record in items:
+        yield dumps(asset) + b':' + record.to_json()
+
+
+def _select(record: 'PriceRecord', fields: Sequence[str]) -> Dict:
+    values = record.to_dict()
+    return {field: values[field] for field in fields}
+
+
+def prices_columnar_response(prices: Dict[str, 'PriceRecord'], failed: List[str], aliases: Dict[str, str],
+                             stale: List[str] = (), fields: Sequence[str] = PRICE_FIELDS) -> bytes:
+    """Columnar body for bulk requests: one array per field, aligned with ``assets``.
+
+    ``{"assets": [...], "columns": {field: [...]}, "failed": [...], "stale": [...], "aliases": {...}}``
+    avoids repeating every key per asset, which roughly halves large responses.
+    """
+    values = [record.to_dict() for record in prices.values()]
+    return dumps({
+        "assets": list(prices),
+        "columns": {field: [value[field] for value in values] for field in fields},
+        "failed": failed,
+        "stale": list(stale),
+        "aliases": aliases,
+    })
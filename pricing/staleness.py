@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, fields as dataclass_fields, replace
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from pricing import logging_setup
+from pricing.price_record import PriceRecord
+
+# What to do with a price older than its policy's max_age
+ACCEPT, FLAG, REJECT = 'accept', 'flag', 'reject'
+_ACTIONS = (ACCEPT, FLAG, REJECT)
+
+
+@dataclass(frozen=True)
+class StalenessPolicy:
+    # Older prices are logged as a warning but served as fresh
+    warn_after: float
+    # Older prices get ``action``: served as fresh, served flagged stale, or treated as missing
+    max_age: float
+    action: str
+
+
+def _parse_overrides(raw: str, default: StalenessPolicy) -> Dict[str, StalenessPolicy]:
+    overrides = {}
+    for asset, fields in json.loads(raw).items():
+        if not isinstance(fields, dict):
+            raise ValueError(f"Staleness policy for {asset!r} must be a JSON object")
+        unknown = set(fields).difference(f.name for f in dataclass_fields(StalenessPolicy))
+        if unknown:
+            raise ValueError(f"Unknown staleness policy fields for {asset!r}: {sorted(unknown)}")
+        values = dict(fields)
+        for name in ('warn_after', 'max_age'):
+            if name in values:
+                try:
+                    values[name] = float(values[name])
+                except (TypeError, ValueError):
+                    raise ValueError(f"Staleness {name} for {asset!r} must be a number of seconds") from None
+        if 'action' in values:
+            values['action'] = str(values['action']).lower()
+        policy = replace(default, **values)
+        if policy.action not in _ACTIONS:
+            raise ValueError(f"Staleness action for {asset!r} must be one of {_ACTIONS}")
+        overrides[asset] = policy
+    return overrides
+
+
+# Global policy, plus per-asset overrides as JSON, e.g.
+# PRICE_STALENESS_OVERRIDES='{"usd-coin": {"max_age": 86400, "action": "accept"}}'.
+# A bad override fails at import, so a misconfigured worker does not start.
+DEFAULT_POLICY = StalenessPolicy(
+    warn_after=float(os.environ.get('PRICE_STALE_WARN_SECONDS', 1800)),
+    max_age=float(os.environ.get('PRICE_STALE_MAX_SECONDS', 3600)),
+    action=os.environ.get('PRICE_STALE_ACTION', FLAG).lower(),
+)
+if DEFAULT_POLICY.action not in _ACTIONS:
+    raise ValueError(f"PRICE_STALE_ACTION must be one of {_ACTIONS}")
+_overrides = _parse_overrides(os.environ.get('PRICE_STALENESS_OVERRIDES', '{}'), DEFAULT_POLICY)
+
+# The oldest-served gauge reports the worst age seen over this window
+_OLDEST_WINDOW_SECONDS = 60
+
+# Metrics
+PRICE_AGE = Histogram('price_age_seconds', 'Age of each price when it is served',
+                      buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400))
+PRICE_OLDEST_SERVED_AGE = Gauge('price_oldest_served_age_seconds',
+                                'Age of the oldest price served in the last minute',
+                                multiprocess_mode='livemax')
+PRICE_STALE_SERVED = Counter('price_stale_total', 'Number of prices older than their max age, by action taken',
+                             ['action'])
+
+_oldest_age = 0.0
+_oldest_window_started = 0.0
+
+# Setup logging
+logger = logging.getLogger("staleness")
+logging_setup.configure_logger(logger)
+
+
+def policy_for(asset: str) -> StalenessPolicy:
+    return _overrides.get(asset, DEFAULT_POLICY)
+
+
+def _describe(seconds: float) -> str:
+    if seconds >= 3600 and seconds % 3600 == 0:
+        hours = int(seconds // 3600)
+        return f"{hours} hour{'s' if hours != 1 else ''}"
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{int(seconds // 60)} minutes"
+    return f"{seconds:g} seconds"
+
+
+def log_if_stale(record: PriceRecord, log: logging.Logger) -> None:
+    """Log a price past its policy thresholds; called once per read from Redis."""
+    asset = record.asset
+    policy = policy_for(asset)
+    age = record.age()
+    if age > policy.max_age and policy.action != ACCEPT:
+        log.error("Cache item for %s is more than %s old.", asset, _describe(policy.max_age),
+                  extra={'asset': asset})
+    elif age > policy.warn_after:
+        log.warning("Cache item for %s is more than %s old.", asset, _describe(policy.warn_after),
+                    extra={'asset': asset})
+
+
+def action_for(record: PriceRecord) -> str:
+    """Return the policy action for a price; records no metrics.
+
+    Returns ACCEPT for a price within its max age (or one whose policy
+    accepts stale data), otherwise the policy's FLAG or REJECT.
+    """
+    policy = policy_for(record.asset)
+    if record.age() <= policy.max_age:
+        return ACCEPT
+    return policy.action
+
+
+def observe_served(record: PriceRecord) -> None:
+    """Record the age of a price that is being returned to a client."""
+    global _oldest_age, _oldest_window_started
+    now = time.time()
+    age = record.age(now)
+    PRICE_AGE.observe(age)
+    if age > _oldest_age or now - _oldest_window_started >= _OLDEST_WINDOW_SECONDS:
+        if now - _oldest_window_started >= _OLDEST_WINDOW_SECONDS:
+            _oldest_window_started = now
+        _oldest_age = age
+        PRICE_OLDEST_SERVED_AGE.set(age)
+    policy = policy_for(record.asset)
+    if age > policy.max_age:
+        PRICE_STALE_SERVED.labels(policy.action).inc()
+
+
+def observe_rejected() -> None:
+    """Count a price withheld because it was past its max age and nothing else was served for it."""
+    PRICE_STALE_SERVED.labels(REJECT).inc()
@@ -0,0 +1,78 @@
+import importlib.util
+import math
+import os
+from typing import Optional
+
+# Launcher for the price service under supervisord. The service is I/O-bound
+# on Redis, so it runs one worker per available CPU unless WEB_CONCURRENCY
+# says otherwise; event_loop_lag_seconds shows whether that is enough.
+HOST = os.environ.get('PRICE_SERVER_HOST', '0.0.0.0')
+PORT = int(os.environ.get('NOMAD_PORT_http', 8080))
+
+_CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+_CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+_CGROUP_V1_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by a cgroup quota (e.g. a Nomad cpu_hard_limit), or None if unlimited."""
+    cpu_max = _read(_CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    quota, period = _read(_CGROUP_V1_QUOTA), _read(_CGROUP_V1_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def worker_count() -> int:
+    configured = os.environ.get('WEB_CONCURRENCY')
+    if configured:
+        return max(1, int(configured))
+    return available_cpus()
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def event_loop() -> str:
+    return 'uvloop' if _installed('uvloop') else 'asyncio'
+
+
+def http_protocol() -> str:
+    return 'httptools' if _installed('httptools') else 'h11'
+
+
+def main() -> None:
+    import uvicorn
+
+    workers, loop, http = worker_count(), event_loop(), http_protocol()
+    print(f"Starting price_app on {HOST}:{PORT} with {workers} worker(s), loop={loop}, http={http}", flush=True)
+    uvicorn.run('price_app:app', host=HOST, port=PORT, workers=workers, loop=loop, http=http)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,27 @@
 import sys
+import types
 from unittest.mock import MagicMock
 
 # aioredis 2.0.1 is broken on Python >= 3.11 (duplicate TimeoutError base).
 # Production runs Python 3.10 in Docker. Provide a mock so modules that
-# import aioredis can be collected on newer interpreters.
+# import aioredis can be collected on newer interpreters. Its exception
+# classes stay real so they can be raised and caught as aioredis' would be.
 try:
     import aioredis  # noqa: F401
 except (ImportError, TypeError):
-    sys.modules['aioredis'] = MagicMock()
+    exceptions = types.ModuleType('aioredis.exceptions')
+
+    class RedisError(Exception):
+        pass
+
+    class ConnectionError(RedisError):
+        pass
+
+    class TimeoutError(RedisError):
+        pass
+
+    exceptions.RedisError = RedisError
+    exceptions.ConnectionError = ConnectionError
+    exceptions.TimeoutError = TimeoutError
+    sys.modules['aioredis'] = MagicMock(exceptions=exceptions)
+    sys.modules['aioredis.exceptions'] = exceptions
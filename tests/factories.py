@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+from pricing.price_record import PriceRecord
+
+
+def price_hash(price='2000.5', age_seconds=0, **overrides):
+    """A Redis price hash written ``age_seconds`` ago; ``overrides`` replace individual fields."""
+    cached_data = {
+        'usd_price': price,
+        'volume_last_24_hours': '1000000.0',
+        'current_marketcap_usd': '50000000.0',
+        'timestamp': (datetime.now() - timedelta(seconds=age_seconds)).isoformat(),
+    }
+    cached_data.update(overrides)
+    return cached_data
+
+
+def price_record(asset, price='2000.5', age_seconds=0):
+    return PriceRecord.from_hash(asset, price_hash(price, age_seconds))
@@ -0,0 +1,32 @@
+import os
+
+from benchmarks import import_profile
+
+# Loaded in startup() or never on the import path
+DEFERRED_MODULES = ['apscheduler', 'aioboto3', 'aiobotocore', 'botocore', 'boto3']
+
+
+# --- Import-time profile ---
+
+def test_import_profile_is_written_and_defers_heavy_modules(tmp_path):
+    entries = import_profile.profile('price_app')
+
+    # IMPORT_PROFILE_OUTPUT keeps the profile as a CI artifact; otherwise it is discarded with tmp_path
+    output = os.environ.get('IMPORT_PROFILE_OUTPUT') or str(tmp_path / 'import_profile.json')
+    import_profile.save(output, 'price_app', entries)
+    assert os.path.getsize(output) > 0
+
+    imported = {entry['module'].split('.')[0] for entry in entries}
+    assert 'price_app' in imported
+    assert imported.isdisjoint(DEFERRED_MODULES)
+
+
+def test_parse_reads_importtime_lines():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   orjson\n"
+              "import time:       300 |        420 | pricing.serialization\n")
+
+    assert import_profile.parse(stderr) == [
+        {'module': 'orjson', 'self_us': 120, 'cumulative_us': 120, 'depth': 1},
+        {'module': 'pricing.serialization', 'self_us': 300, 'cumulative_us': 420, 'depth': 0},
+    ]
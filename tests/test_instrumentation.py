@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+
+from pricing.instrumentation import probe_event_loop_lag
+
+
+# --- Event loop lag probe ---
+
+async def test_probe_measures_time_queued_behind_blocking_callbacks():
+    before = REGISTRY.get_sample_value('event_loop_lag_seconds_count') or 0
+    asyncio.get_running_loop().call_soon(time.sleep, 0.05)
+
+    lag = await probe_event_loop_lag()
+
+    assert lag >= 0.05
+    assert REGISTRY.get_sample_value('event_loop_lag_seconds_count') == before + 1
+    assert REGISTRY.get_sample_value('event_loop_lag_last_seconds') == lag
+
+
+async def test_probe_reports_little_lag_on_an_idle_loop():
+    assert await probe_event_loop_lag() < 0.05
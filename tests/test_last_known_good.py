@@ -0,0 +1,55 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from pricing import last_known_good
+from tests.factories import price_record
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    last_known_good.clear()
+    yield
+    last_known_good.clear()
+
+
+def test_remember_keeps_latest_and_drops_least_recently_updated():
+    with patch.object(last_known_good, "_MAX_ENTRIES", 2):
+        last_known_good.remember([price_record("eth"), price_record("btc")])
+        newer = price_record("eth", '2100')
+        last_known_good.remember([newer, price_record("sol")])
+    assert last_known_good.get("eth") is newer
+    assert last_known_good.get("btc") is None
+    assert last_known_good.get("sol") is not None
+
+
+async def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "lkg.json")
+    eth = price_record("eth")
+    last_known_good.remember([eth])
+    assert await last_known_good.save(path) == 1
+
+    last_known_good.clear()
+    assert last_known_good.load(path) == 1
+    assert last_known_good.get("eth") == eth
+
+
+def test_load_prefers_records_served_since_startup(tmp_path):
+    path = tmp_path / "lkg.json"
+    path.write_text(json.dumps({
+        "eth": {"usd_price": 1, "timestamp": "2020-01-01T00:00:00"},
+        "broken": {"usd_price": "x", "timestamp": "2020-01-01T00:00:00"},
+    }))
+    served = price_record("eth")
+    last_known_good.remember([served])
+    assert last_known_good.load(str(path)) == 0
+    assert last_known_good.get("eth") is served
+    assert last_known_good.get("broken") is None
+
+
+def test_load_ignores_missing_or_corrupt_file(tmp_path):
+    assert last_known_good.load(str(tmp_path / "missing.json")) == 0
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json")
+    assert last_known_good.load(str(corrupt)) == 0
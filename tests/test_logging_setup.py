@@ -0,0 +1,87 @@
+import contextvars
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+from pricing import logging_setup
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_queued_records_keep_caller_context_and_extras():
+    target = _ListHandler()
+    with patch.object(logging_setup, "_QUEUE_ENABLED", True), \
+            patch.object(logging_setup, "_stream_handler", return_value=target), \
+            patch.object(logging_setup, "_log_queue", queue.SimpleQueue()), \
+            patch.object(logging_setup, "_listener", None):
+        logger = logging.getLogger("test_logging_setup.queued")
+        logger.propagate = False
+        logging_setup.configure_logger(logger, filters=[_RequestIdFilter()])
+        token = _request_id.set("req-1")
+        try:
+            logger.warning("Price for %s is stale", "eth", extra={'asset': "eth"})
+        finally:
+            _request_id.reset(token)
+        logging_setup.stop_listener()
+
+    assert len(target.records) == 1
+    record = target.records[0]
+    assert record.getMessage() == "Price for eth is stale"
+    assert record.request_id == "req-1"
+    assert record.asset == "eth"
+
+
+def test_queued_exception_keeps_traceback_for_json_output():
+    target = _ListHandler()
+    with patch.object(logging_setup, "_QUEUE_ENABLED", True), \
+            patch.object(logging_setup, "_stream_handler", return_value=target), \
+            patch.object(logging_setup, "_log_queue", queue.SimpleQueue()), \
+            patch.object(logging_setup, "_listener", None):
+        logger = logging.getLogger("test_logging_setup.exception")
+        logger.propagate = False
+        logging_setup.configure_logger(logger)
+        try:
+            raise ValueError("bad hash")
+        except ValueError:
+            logger.exception("Error parsing %s", "eth")
+        logging_setup.stop_listener()
+
+    record = target.records[0]
+    payload = json.loads(logging_setup.JsonFormatter().format(record))
+    assert payload["message"] == "Error parsing eth"
+    assert "ValueError: bad hash" in payload["exc_info"]
+    # Text output still ends with the traceback
+    assert logging.Formatter().format(record).endswith("ValueError: bad hash")
+
+
+def test_json_formatter_emits_structured_fields():
+    record = logging.LogRecord("redis_cache", logging.WARNING, __file__, 1,
+                               "No cached data found for %s.", ("eth",), None)
+    record.asset = "eth"
+    payload = json.loads(logging_setup.JsonFormatter().format(record))
+    assert payload["message"] == "No cached data found for eth."
+    assert payload["level"] == "WARNING"
+    assert payload["asset"] == "eth"
+
+
+def test_sample_asset_log_honours_rate():
+    with patch.object(logging_setup, "PER_ASSET_LOG_SAMPLE_RATE", 0):
+        assert not any(logging_setup.sample_asset_log() for _ in range(100))
+    with patch.object(logging_setup, "PER_ASSET_LOG_SAMPLE_RATE", 1):
+        assert all(logging_setup.sample_asset_log() for _ in range(100))
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from pricing import metrics_export
+from pricing.metrics_export import CachedExposition, build_registry, cleanup_dead_workers
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _write(path, kind, pid, name, value):
+    values = MmapedDict(os.path.join(path, f'{kind}_{pid}.db'))
+    values.write_value(mmap_key(name, name, [], [], name), value, 0)
+    values.close()
+
+
+# --- Dead worker cleanup ---
+
+def test_cleanup_removes_gauges_of_dead_workers(tmp_path, dead_pid):
+    for kind in ('gauge_all', 'gauge_livesum', 'counter', 'histogram'):
+        _write(str(tmp_path), kind, dead_pid, 'current_requests', 1.0)
+
+    assert cleanup_dead_workers(str(tmp_path)) == {dead_pid}
+
+    assert sorted(os.listdir(tmp_path)) == [f'counter_{dead_pid}.db', f'histogram_{dead_pid}.db']
+
+
+def test_cleanup_keeps_files_of_live_workers(tmp_path):
+    _write(str(tmp_path), 'gauge_all', os.getpid(), 'current_requests', 1.0)
+
+    assert cleanup_dead_workers(str(tmp_path)) == set()
+
+    assert os.listdir(tmp_path) == [f'gauge_all_{os.getpid()}.db']
+
+
+def test_mark_worker_exited_removes_own_gauges(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    _write(str(tmp_path), 'gauge_all', os.getpid(), 'current_requests', 1.0)
+    _write(str(tmp_path), 'counter', os.getpid(), 'requests_total', 1.0)
+
+    metrics_export.mark_worker_exited()
+
+    assert os.listdir(tmp_path) == [f'counter_{os.getpid()}.db']
+
+
+# --- Aggregation and caching ---
+
+def test_build_registry_aggregates_every_worker(tmp_path, dead_pid):
+    _write(str(tmp_path), 'counter', os.getpid(), 'requests_total', 2.0)
+    _write(str(tmp_path), 'counter', dead_pid, 'requests_total', 3.0)
+
+    registry = build_registry(str(tmp_path))
+
+    assert registry.get_sample_value('requests_total') == 5.0
+
+
+def test_cached_exposition_reuses_output_within_ttl():
+    registry = CollectorRegistry()
+    requests = Counter('requests_total', '', registry=registry)
+    exposition = CachedExposition(registry, ttl=2.0)
+
+    with patch('pricing.metrics_export.time.monotonic', side_effect=[100.0, 101.0, 102.5]):
+        first = exposition.render()
+        requests.inc()
+        cached = exposition.render()
+        refreshed = exposition.render()
+
+    assert cached == first
+    assert b'requests_total 0.0' in first
+    assert b'requests_total 1.0' in refreshed
+
+
+def test_cached_exposition_scans_for_dead_workers_at_most_every_interval(tmp_path):
+    exposition = CachedExposition(CollectorRegistry(), ttl=0, multiprocess_path=str(tmp_path))
+
+    with patch('pricing.metrics_export.cleanup_dead_workers') as cleanup, \
+            patch('pricing.metrics_export.time.monotonic', side_effect=[100.0, 110.0, 131.0]):
+        for _ in range(3):
+            exposition.render()
+
+    assert cleanup.call_count == 2
@@ -0,0 +1,79 @@
+import pytest
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from pricing.metrics_middleware import MetricsMiddleware, Route
+
+ROUTES = [
+    Route('GET', '/price/', 'price_single', 'single', prefix=True),
+    Route('GET', '/stream/prices', 'price_stream', 'stream', timed=False),
+]
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+def _middleware(registry, app, flush_interval=0):
+    return MetricsMiddleware(
+        app, ROUTES,
+        Counter("requests_total", "", ["endpoint", "method", "type"], registry=registry),
+        Gauge("current_requests", "", registry=registry),
+        Histogram("request_latency_seconds", "", ["endpoint", "type"], registry=registry),
+        flush_interval=flush_interval)
+
+
+async def _ok(scope, receive, send):
+    pass
+
+
+async def _call(middleware, path, method='GET'):
+    await middleware({'type': 'http', 'method': method, 'path': path}, None, None)
+
+
+def _count(registry, endpoint):
+    return registry.get_sample_value('requests_total', {'endpoint': endpoint, 'method': 'GET',
+                                                        'type': endpoint.split('_')[1]}) or 0
+
+
+# --- Request accounting ---
+
+async def test_counts_and_times_matching_routes(registry):
+    middleware = _middleware(registry, _ok)
+    await _call(middleware, '/price/ethereum')
+    await _call(middleware, '/price/bitcoin')
+    await _call(middleware, '/metrics')
+
+    assert _count(registry, 'price_single') == 2
+    assert registry.get_sample_value('request_latency_seconds_count',
+                                     {'endpoint': 'price_single', 'type': 'single'}) == 2
+    assert registry.get_sample_value('current_requests') == 0
+
+
+async def test_in_progress_gauge_does_not_leak_on_exceptions(registry):
+    async def failing(scope, receive, send):
+        assert registry.get_sample_value('current_requests') == 1
+        raise RuntimeError("boom")
+
+    middleware = _middleware(registry, failing)
+    with pytest.raises(RuntimeError):
+        await _call(middleware, '/price/ethereum')
+    assert registry.get_sample_value('current_requests') == 0
+
+
+async def test_streams_are_counted_but_not_timed(registry):
+    middleware = _middleware(registry, _ok)
+    await _call(middleware, '/stream/prices')
+    assert _count(registry, 'price_stream') == 1
+    assert registry.get_sample_value('request_latency_seconds_count',
+                                     {'endpoint': 'price_stream', 'type': 'stream'}) is None
+
+
+async def test_counts_are_batched_until_flush(registry):
+    middleware = _middleware(registry, _ok, flush_interval=60)
+    for _ in range(5):
+        await _call(middleware, '/price/ethereum')
+    assert _count(registry, 'price_single') == 0
+
+    middleware.flush()
+    assert _count(registry, 'price_single') == 5
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import price_app
+from pricing import last_known_good, metrics_export, price_snapshot, price_stream, redis_cache_service
+from pricing.price_record import PriceRecord
+from tests.factories import price_hash
+
+
+async def _get_cached_price(asset):
+    # A plain coroutine rather than AsyncMock, which records every call
+    return PriceRecord.from_hash(asset, price_hash())
+
+
+@pytest.fixture
+async def client():
+    """Serve the app without scheduled jobs or a Redis subscription."""
+    with patch.object(price_app, "scheduler", AsyncIOScheduler()), \
+            patch.object(price_snapshot, "PREFETCH_INTERVAL", 0), \
+            patch.object(price_app, "ALIASES_RELOAD_INTERVAL", 0), \
+            patch.object(price_app, "LOOP_LAG_PROBE_INTERVAL", 0), \
+            patch.object(redis_cache_service, "_INVALIDATION_ENABLED", False):
+        async with price_app.app.test_app() as test_app:
+            yield test_app.test_client()
+
+
+# --- PriceService lifetime: one instance, flat logging and memory ---
+
+@patch("pricing.redis_cache_service.get_cached_price_async", _get_cached_price)
+async def test_price_service_is_app_scoped(client):
+    service = price_app.price_service
+    handlers = len(logging.getLogger("PriceService").handlers)
+
+    for _ in range(2000):
+        response = await client.get('/price/ethereum')
+        assert response.status_code == 200
+
+    assert price_app.price_service is service
+    assert len(logging.getLogger("PriceService").handlers) == handlers
+
+
+@patch("pricing.redis_cache_service.get_cached_price_async", _get_cached_price)
+async def test_per_request_memory_stays_flat(client):
+    for _ in range(200):
+        await client.get('/price/ethereum')
+
+    # pytest's log capture keeps every record; keep it out of the measurement
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(2000):
+            await client.get('/price/ethereum')
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+    # Well under 1KB retained per request; the old per-request handler
+    # alone retained more than that.
+    assert current - baseline < 200 * 1024
+
+
+# --- Serve-stale fallback ---
+
+async def _redis_down(asset):
+    redis_cache_service._circuit_breaker.record_failure()
+    return None
+
+
+async def test_price_is_served_stale_during_outage(client):
+    with patch("pricing.redis_cache_service.get_cached_price_async", _get_cached_price):
+        response = await client.get('/price/ethereum')
+    assert response.headers['X-Price-Age'] == '0'
+    assert 'X-Price-Stale' not in response.headers
+    assert (await response.get_json())['stale'] is False
+
+    try:
+        with patch("pricing.redis_cache_service.get_cached_price_async", _redis_down):
+            response = await client.get('/price/ethereum')
+        assert response.status_code == 200
+        assert response.headers['X-Price-Stale'] == 'true'
+        assert (await response.get_json())['stale'] is True
+    finally:
+        redis_cache_service._circuit_breaker.reset()
+        last_known_good.clear()
+
+
+# --- Asset aliases ---
+
+async def test_single_price_reports_requested_and_canonical_asset(client):
+    reads = []
+
+    async def fetch(asset):
+        reads.append(asset)
+        return PriceRecord.from_hash(asset, price_hash())
+
+    with patch("pricing.redis_cache_service.get_cached_price_async", fetch):
+        response = await client.get('/price/weth')
+    assert response.status_code == 200
+    body = await response.get_json()
+    assert (body["asset"], body["canonical_asset"]) == ("weth", "ethereum")
+    assert reads == ["ethereum"]
+
+
+async def test_prices_reads_aliases_of_one_asset_once(client):
+    reads = []
+
+    async def fetch(assets):
+        reads.append(list(assets))
+        return {asset: PriceRecord.from_hash(asset, price_hash()) for asset in assets}
+
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        response = await client.get('/prices?assets=eth,weth')
+    assert response.status_code == 200
+    body = await response.get_json()
+    assert list(body["prices"]) == ["ethereum"]
+    assert body["aliases"] == {"eth": "ethereum", "weth": "ethereum"}
+    assert reads == [["ethereum"]]
+
+
+# --- Bulk POST /prices ---
+
+async def _get_cached_prices(assets):
+    return {asset: None if asset == "missing" else PriceRecord.from_hash(asset, price_hash()) for asset in assets}
+
+
+@patch("pricing.redis_cache_service.get_cached_prices_async", _get_cached_prices)
+async def test_bulk_prices_trims_and_deduplicates(client):
+    response = await client.post('/prices', json={"assets": [" ethereum", "ethereum ", "", "missing"]})
+    assert response.status_code == 200
+    body = await response.get_json()
+    assert list(body["prices"]) == ["ethereum"]
+    assert body["failed"] == ["missing"]
+    assert body["aliases"] == {"ethereum": "ethereum", "missing": "missing"}
+
+
+@patch("pricing.redis_cache_service.get_cached_prices_async", _get_cached_prices)
+async def test_bulk_prices_selects_fields_and_columnar_format(client):
+    response = await client.post('/prices', json={"assets": ["ethereum", "bitcoin"], "fields": ["usd_price"]})
+    assert (await response.get_json())["prices"] == {"ethereum": {"usd_price": 2000.5},
+                                                     "bitcoin": {"usd_price": 2000.5}}
+
+    response = await client.post('/prices', json={"assets": ["ethereum", "bitcoin"], "format": "columnar",
+                                                   "fields": ["usd_price", "current_marketcap_usd"]})
+    body = await response.get_json()
+    assert body["assets"] == ["ethereum", "bitcoin"]
+    assert body["columns"] == {"usd_price": [2000.5, 2000.5], "current_marketcap_usd": [50000000.0, 50000000.0]}
+
+
+@pytest.mark.parametrize("payload", [
+    ["ethereum"],
+    {"assets": "ethereum"},
+    {"assets": [" ", ""]},
+    {"assets": ["ethereum"], "fields": ["price"]},
+    {"assets": ["ethereum"], "format": "csv"},
+])
+async def test_bulk_prices_rejects_invalid_body(client, payload):
+    response = await client.post('/prices', json=payload)
+    assert response.status_code == 400
+
+
+async def test_bulk_prices_caps_asset_count(client):
+    with patch.object(price_app, "MAX_BULK_ASSETS", 2):
+        response = await client.post('/prices', json={"assets": ["a", "b", "c"]})
+    assert response.status_code == 400
+
+
+# --- Price stream (SSE) ---
+
+@patch("pricing.redis_cache_service.get_cached_prices_async", _get_cached_prices)
+async def test_price_stream_sends_aliases_then_prices(client):
+    async with client.request('/stream/prices?assets=eth') as connection:
+        await connection.send_complete()
+        received = b''
+        while b'event: price' not in received:
+            received += await asyncio.wait_for(connection.receive(), 1)
+        await connection.disconnect()
+
+    assert received.startswith(b'event: aliases\ndata: {"eth":"ethereum"}\n\n')
+    assert b'data: {"asset":"ethereum","stale":false,"usd_price":2000.5' in received
+    await asyncio.sleep(0)
+    assert not price_stream._subscribers
+
+
+async def test_price_stream_requires_assets(client):
+    response = await client.get('/stream/prices?assets=,')
+    assert response.status_code == 400
+
+
+
+# --- Metrics ---
+
+async def test_metrics_served_by_app_in_a_single_process(client, monkeypatch):
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    with patch.object(metrics_export, "_exposition", None):
+        response = await client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert b'# TYPE requests_total counter' in await response.get_data()
+
+
+async def test_metrics_left_to_metrics_server_in_multiprocess_mode(client, monkeypatch, tmp_path):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    response = await client.get('/metrics')
+    assert response.status_code == 404
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pricing.price_record import PriceRecord
+from tests.factories import price_hash
+
+
+def test_from_hash_parses_numbers_once():
+    record = PriceRecord.from_hash("eth", price_hash())
+    assert record.usd_price == 2000.5
+    assert record.volume_last_24_hours == 1000000.0
+    assert record.current_marketcap_usd == 50000000.0
+
+
+def test_age_uses_epoch_timestamp():
+    written = datetime.now() - timedelta(minutes=45)
+    record = PriceRecord.from_hash("eth", price_hash(timestamp=written.isoformat()))
+    assert record.age() == pytest.approx(45 * 60, abs=5)
+    assert record.age(now=written.timestamp() + 10) == pytest.approx(10)
+
+
+def test_to_dict_matches_response_schema():
+    cached_data = price_hash()
+    assert PriceRecord.from_hash("eth", cached_data).to_dict() == {
+        "usd_price": 2000.5,
+        "volume_last_24_hours": 1000000.0,
+        "current_marketcap_usd": 50000000.0,
+        "timestamp": cached_data['timestamp'],
+    }
+
+
+def test_unparseable_optional_fields_become_none():
+    record = PriceRecord.from_hash("eth", price_hash(volume_last_24_hours='None'))
+    assert record.volume_last_24_hours is None
+
+
+@pytest.mark.parametrize("overrides", [
+    {'usd_price': 'not-a-number'},
+    {'timestamp': ''},
+    {'timestamp': 'yesterday'},
+])
+def test_from_hash_rejects_unusable_price_or_timestamp(overrides):
+    with pytest.raises(ValueError):
+        PriceRecord.from_hash("eth", price_hash(**overrides))
+
+
+def test_record_is_compact_and_immutable():
+    record = PriceRecord.from_hash("eth", price_hash())
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.usd_price = 1.0
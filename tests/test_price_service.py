@@ -0,0 +1,197 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+import price_service
+from price_service import PriceService
+from pricing import last_known_good, price_snapshot, redis_cache_service, staleness
+from pricing.price_record import PriceRecord
+from tests.factories import price_record
+
+
+def _fetch_single(result):
+    async def fetch(asset):
+        return result
+    return fetch
+
+
+@pytest.fixture(autouse=True)
+def empty_snapshot():
+    with patch.object(price_snapshot, "_snapshot", {}), patch.object(last_known_good, "_records", {}):
+        redis_cache_service._circuit_breaker.reset()
+        yield
+    redis_cache_service._circuit_breaker.reset()
+
+
+# --- Batch fan-out: concurrency cap and deadline ---
+
+@patch.object(price_service, "_BATCH_CHUNK_SIZE", 2)
+@patch.object(price_service, "_BATCH_CONCURRENCY", 2)
+async def test_batch_chunks_respect_concurrency_cap():
+    in_flight = 0
+    peak = 0
+    chunks = []
+
+    async def fetch(assets):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        chunks.append(list(assets))
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {asset: price_record(asset) for asset in assets}
+
+    assets = [f"asset{i}" for i in range(9)]
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        prices, failed, stale = await PriceService().get_prices(assets)
+
+    assert set(prices) == set(assets)
+    assert failed == []
+    assert len(chunks) == 5
+    assert peak == 2
+
+
+@patch.object(price_service, "_BATCH_CHUNK_SIZE", 1)
+@patch.object(price_service, "_BATCH_DEADLINE", 0.1)
+async def test_slow_assets_fail_at_deadline():
+    async def fetch(assets):
+        if assets == ["hung"]:
+            await asyncio.sleep(1)
+        return {asset: price_record(asset) for asset in assets}
+
+    started = time.monotonic()
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        prices, failed, stale = await PriceService().get_prices(["eth", "hung", "btc"])
+
+    assert time.monotonic() - started < 0.5
+    assert set(prices) == {"eth", "btc"}
+    assert failed == ["hung"]
+    assert stale == []
+
+
+# --- Serve-stale fallback ---
+
+async def test_batch_serves_last_known_good_while_redis_is_down():
+    last_known_good.remember([price_record("eth")])
+
+    async def fetch(assets):
+        redis_cache_service._circuit_breaker.record_failure()
+        return {asset: None for asset in assets}
+
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        prices, failed, stale = await PriceService().get_prices(["eth", "btc"])
+
+    assert set(prices) == {"eth"}
+    assert failed == ["btc"]
+    assert stale == ["eth"]
+
+
+async def test_missing_asset_is_not_served_stale_while_redis_is_up():
+    last_known_good.remember([price_record("delisted")])
+
+    async def fetch(assets):
+        return {asset: None for asset in assets}
+
+    with patch("pricing.redis_cache_service.get_cached_price_async", _fetch_single(None)), \
+            patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        assert await PriceService().get_single_price("delisted") == (None, False)
+        prices, failed, stale = await PriceService().get_prices(["delisted"])
+
+    assert failed == ["delisted"]
+    assert stale == []
+
+
+async def test_single_price_is_remembered_and_served_stale_on_error():
+    record = price_record("eth")
+    service = PriceService()
+    with patch("pricing.redis_cache_service.get_cached_price_async", _fetch_single(record)):
+        assert await service.get_single_price("eth") == (record, False)
+
+    async def failing(asset):
+        redis_cache_service._circuit_breaker.record_failure()
+        raise ConnectionError("down")
+
+    with patch("pricing.redis_cache_service.get_cached_price_async", failing):
+        assert await service.get_single_price("eth") == (record, True)
+
+
+# --- Staleness policy ---
+
+async def test_staleness_policy_flags_or_rejects_old_prices():
+    old = PriceRecord.from_hash("eth", {'usd_price': '1', 'timestamp': '2020-01-01T00:00:00'})
+
+    async def fetch(assets):
+        return {asset: old for asset in assets}
+
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch), \
+            patch("pricing.redis_cache_service.get_cached_price_async", _fetch_single(old)):
+        with patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, staleness.FLAG)):
+            assert await PriceService().get_prices(["eth"]) == ({"eth": old}, [], ["eth"])
+            assert await PriceService().get_single_price("eth") == (old, True)
+        with patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, staleness.REJECT)):
+            assert await PriceService().get_prices(["eth"]) == ({}, ["eth"], [])
+            assert await PriceService().get_single_price("eth") == (None, False)
+
+
+async def test_rejected_prices_are_counted_once_and_not_observed_as_served():
+    old = PriceRecord.from_hash("eth", {'usd_price': '1', 'timestamp': '2020-01-01T00:00:00'})
+    last_known_good.remember([old])
+    served = REGISTRY.get_sample_value('price_age_seconds_count')
+    rejected = REGISTRY.get_sample_value('price_stale_total', {'action': 'reject'}) or 0
+
+    async def fetch(assets):
+        redis_cache_service._circuit_breaker.record_failure()
+        return {asset: old for asset in assets}
+
+    with patch("pricing.redis_cache_service.get_cached_prices_async", fetch), \
+            patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, staleness.REJECT)):
+        assert await PriceService().get_prices(["eth"]) == ({}, ["eth"], [])
+
+    assert REGISTRY.get_sample_value('price_age_seconds_count') == served
+    assert REGISTRY.get_sample_value('price_stale_total', {'action': 'reject'}) == rejected + 1
+
+
+async def test_snapshot_entry_past_max_age_is_read_again_from_redis():
+    fresh = price_record("eth")
+    reads = []
+
+    async def fetch(assets):
+        reads.append(assets)
+        return {asset: fresh for asset in assets}
+
+    with patch.object(price_snapshot, "_snapshot", {"eth": price_record("eth", age_seconds=4000)}), \
+            patch.object(price_snapshot, "_loaded_at", time.monotonic()), \
+            patch("pricing.redis_cache_service.get_cached_prices_async", fetch), \
+            patch("pricing.redis_cache_service.get_cached_price_async", _fetch_single(fresh)), \
+            patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, staleness.REJECT)):
+        assert await PriceService().get_prices(["eth"]) == ({"eth": fresh}, [], [])
+        assert await PriceService().get_single_price("eth") == (fresh, False)
+    assert reads == [["eth"]]
+
+
+# --- Batch size and hit ratio ---
+
+def _lookups(source):
+    return REGISTRY.get_sample_value('price_service_lookups_total', {'source': source}) or 0
+
+
+async def test_lookups_are_counted_by_source():
+    sources = ('snapshot', 'cache', 'last_known_good', 'miss')
+    before = {source: _lookups(source) for source in sources}
+    batches = REGISTRY.get_sample_value('price_service_batch_size_count')
+
+    async def fetch(assets):
+        return {asset: None if asset == "gone" else price_record(asset) for asset in assets}
+
+    with patch.object(price_snapshot, "_snapshot", {"eth": price_record("eth")}), \
+            patch.object(price_snapshot, "_loaded_at", time.monotonic()), \
+            patch("pricing.redis_cache_service.get_cached_prices_async", fetch):
+        await PriceService().get_prices(["eth", "btc", "gone"])
+
+    assert {source: _lookups(source) - before[source] for source in sources} == {
+        'snapshot': 1, 'cache': 1, 'last_known_good': 0, 'miss': 1}
+    assert REGISTRY.get_sample_value('price_service_batch_size_count') == batches + 1
+
@@ -0,0 +1,83 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from pricing import last_known_good, price_snapshot, redis_cache_service
+from tests.factories import price_record
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot():
+    """Start every test with an empty snapshot and request ranking."""
+    price_snapshot._snapshot = {}
+    price_snapshot._loaded_at = 0.0
+    price_snapshot._request_counts.clear()
+    last_known_good.clear()
+    yield
+    price_snapshot._snapshot = {}
+    price_snapshot._loaded_at = 0.0
+    price_snapshot._request_counts.clear()
+    last_known_good.clear()
+
+
+def test_hot_assets_merges_static_list_and_most_requested():
+    price_snapshot.record_requests(["btc", "eth", "eth", "sol"])
+    with patch.object(price_snapshot, "_STATIC_ASSETS", ["usd-coin", "eth"]), \
+            patch.object(price_snapshot, "_TOP_N", 2):
+        assert price_snapshot.hot_assets() == ["usd-coin", "eth", "btc"]
+
+
+@patch("pricing.price_snapshot.redis_cache_service.get_cached_prices_async",
+       new_callable=AsyncMock)
+async def test_refresh_loads_found_assets(mock_fetch):
+    eth = price_record("eth")
+    mock_fetch.return_value = {"eth": eth, "gone": None}
+    price_snapshot.record_requests(["eth", "gone"])
+    assert await price_snapshot.refresh() == 1
+    assert price_snapshot.get("eth") is eth
+    assert price_snapshot.get("gone") is None
+    assert last_known_good.get("eth") is eth
+
+
+@patch("pricing.price_snapshot.redis_cache_service.get_cached_prices_async",
+       new_callable=AsyncMock)
+async def test_refresh_keeps_previous_snapshot_when_nothing_loads(mock_fetch):
+    eth = price_record("eth")
+    mock_fetch.return_value = {"eth": eth}
+    price_snapshot.record_requests(["eth"] * 4)
+    await price_snapshot.refresh()
+    mock_fetch.return_value = {"eth": None}
+    assert await price_snapshot.refresh() == 0
+    assert price_snapshot.get("eth") is eth
+
+
+@patch.object(redis_cache_service, "_generations", {})
+async def test_refresh_skips_assets_updated_during_the_read():
+    eth, btc = price_record("eth"), price_record("btc")
+
+    async def fetch(assets):
+        # eth's hash changed after this read started
+        redis_cache_service._generations["eth"] = 1
+        return {"eth": eth, "btc": btc}
+
+    price_snapshot.record_requests(["eth", "btc"])
+    with patch.object(redis_cache_service, "get_cached_prices_async", fetch):
+        assert await price_snapshot.refresh() == 1
+    assert price_snapshot.get("eth") is None
+    assert price_snapshot.get("btc") is btc
+
+
+@patch("pricing.price_snapshot.time")
+def test_get_ignores_expired_snapshot(mock_time):
+    price_snapshot._snapshot = {"eth": {"usd_price": "2000"}}
+    price_snapshot._loaded_at = 100.0
+    mock_time.monotonic.return_value = 100.0 + price_snapshot._MAX_AGE - 1
+    assert price_snapshot.get("eth") is not None
+    mock_time.monotonic.return_value = 100.0 + price_snapshot._MAX_AGE
+    assert price_snapshot.get("eth") is None
+
+
+def test_request_counts_decay_after_refresh():
+    price_snapshot.record_requests(["eth"] * 4 + ["btc"])
+    price_snapshot._decay_request_counts()
+    assert price_snapshot._request_counts == {"eth": 2}
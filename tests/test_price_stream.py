@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from pricing import price_stream, staleness
+from tests.factories import price_record
+
+
+@pytest.fixture(autouse=True)
+async def reset_stream():
+    yield
+    price_stream.close_all()
+    if price_stream._watcher_task is not None:
+        await asyncio.wait_for(price_stream._watcher_task, 1)
+    price_stream._latest.clear()
+    price_stream._dirty.clear()
+    price_stream._watcher_task = None
+
+
+class FakeRedis:
+    """Serves whatever is in ``prices`` and counts batch reads."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.reads = []
+
+    async def get_cached_prices_async(self, assets):
+        self.reads.append(sorted(assets))
+        return {asset: self.prices.get(asset) for asset in assets}
+
+
+# --- Fan-out from one watcher ---
+
+async def test_subscribers_get_current_price_then_changes():
+    redis = FakeRedis({"eth": price_record("eth", age_seconds=300)})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async):
+        first = price_stream.subscribe(["eth"])
+        second = price_stream.subscribe(["eth", "btc"])
+        assert (await first.updates(1))["eth"].record is redis.prices["eth"]
+        assert (await second.updates(1))["eth"].record is redis.prices["eth"]
+
+        redis.prices["eth"] = price_record("eth", '2100')
+        price_stream._on_price_change("eth")
+        assert (await first.updates(1))["eth"].record.usd_price == 2100.0
+        assert (await second.updates(1))["eth"].record.usd_price == 2100.0
+
+    # One shared read per change, not one per subscriber
+    assert redis.reads[-1] == ["eth"]
+    assert len([read for read in redis.reads if "eth" in read]) == 2
+
+
+async def test_late_subscriber_starts_from_latest_without_a_read():
+    redis = FakeRedis({"eth": price_record("eth")})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async):
+        await price_stream.subscribe(["eth"]).updates(1)
+        reads = len(redis.reads)
+        late = price_stream.subscribe(["eth"])
+        assert (await late.updates(1))["eth"].record is redis.prices["eth"]
+    assert len(redis.reads) == reads
+
+
+async def test_unchanged_price_is_not_resent():
+    redis = FakeRedis({"eth": price_record("eth")})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async):
+        subscriber = price_stream.subscribe(["eth"])
+        await subscriber.updates(1)
+        price_stream._on_price_change("eth")
+        assert await subscriber.updates(0.1) == {}
+
+
+# --- Staleness policy ---
+
+async def test_watched_assets_are_polled_while_clients_keep_subscribing():
+    redis = FakeRedis({"eth": price_record("eth")})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async), \
+            patch.object(price_stream, "POLL_INTERVAL", 0.05):
+        await price_stream.subscribe(["eth"]).updates(1)
+        # Each subscribe() wakes the watcher well inside the poll interval
+        for i in range(20):
+            price_stream.subscribe([f"asset{i}"])
+            await asyncio.sleep(0.02)
+    assert sum("eth" in read for read in redis.reads) >= 3
+
+
+@pytest.mark.parametrize("action, expected", [(staleness.FLAG, True), (staleness.ACCEPT, False)])
+async def test_old_price_is_streamed_under_its_policy(action, expected):
+    redis = FakeRedis({"eth": price_record("eth", age_seconds=7200)})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async), \
+            patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, action)):
+        update = (await price_stream.subscribe(["eth"]).updates(1))["eth"]
+    assert update.stale is expected
+
+
+async def test_rejected_price_is_not_streamed():
+    redis = FakeRedis({"eth": price_record("eth", age_seconds=7200), "btc": price_record("btc")})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async), \
+            patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(1800, 3600, staleness.REJECT)):
+        assert set(await price_stream.subscribe(["eth", "btc"]).updates(1)) == {"btc"}
+    assert "eth" not in price_stream._latest
+
+
+async def test_price_turning_stale_is_resent_flagged():
+    redis = FakeRedis({"eth": price_record("eth", age_seconds=1800)})
+    with patch("pricing.redis_cache_service.get_cached_prices_async", redis.get_cached_prices_async):
+        subscriber = price_stream.subscribe(["eth"])
+        assert (await subscriber.updates(1))["eth"].stale is False
+        with patch.object(staleness, "DEFAULT_POLICY", staleness.StalenessPolicy(60, 1200, staleness.FLAG)):
+            price_stream._on_price_change("eth")
+            assert (await subscriber.updates(1))["eth"].stale is True
+
+
+# --- Backpressure and lifecycle ---
+
+def test_slow_subscriber_keeps_only_latest_record():
+    subscriber = price_stream.Subscriber(["eth"])
+    for minutes_ago in (3, 2, 1):
+        subscriber.offer(price_stream.PriceUpdate(price_record("eth", age_seconds=minutes_ago * 60), False))
+    assert len(subscriber._pending) == 1
+
+
+async def test_subscriber_limit_and_close():
+    with patch.object(price_stream, "MAX_SUBSCRIBERS", 1), \
+            patch("pricing.redis_cache_service.get_cached_prices_async", FakeRedis({}).get_cached_prices_async):
+        subscriber = price_stream.subscribe(["eth"])
+        with pytest.raises(price_stream.StreamFull):
+            price_stream.subscribe(["btc"])
+        price_stream.close_all()
+        assert await subscriber.updates(1) is None
+        assert not price_stream._subscribers_by_asset
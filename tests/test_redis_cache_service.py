@@ -1,13 +1,19 @@
-import importlib
+import asyncio
 import inspect
 import json
 import logging
-import sys
+import threading
 import time
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from aioredis.exceptions import (
+    ConnectionError as AioredisConnectionError,
+    TimeoutError as AioredisTimeoutError,
+)
+from prometheus_client import REGISTRY
 from redis.exceptions import (
     ConnectionError as RedisConnectionError,
     DataError,
@@ -16,16 +22,34 @@ from redis.exceptions import (
 )
 
 from pricing import redis_cache_service
+from pricing.price_record import PriceRecord
+from tests.factories import price_hash
 
 
 @pytest.fixture(autouse=True)
 def reset_cache():
-    """Clear URL cache before each test."""
+    """Clear URL cache and shared client before each test."""
     redis_cache_service._cached_redis_url = None
     redis_cache_service._cached_url_timestamp = 0.0
+    redis_cache_service._redis_client = None
+    redis_cache_service._redis_client_url = None
+    redis_cache_service._retired_clients.clear()
+    redis_cache_service._draining_clients.clear()
+    redis_cache_service._url_refresh_task = None
+    redis_cache_service._l1_cache.clear()
+    redis_cache_service._circuit_breaker.reset()
+    redis_cache_service._in_flight.clear()
+    redis_cache_service._generations.clear()
     yield
     redis_cache_service._cached_redis_url = None
     redis_cache_service._cached_url_timestamp = 0.0
+    redis_cache_service._redis_client = None
+    redis_cache_service._redis_client_url = None
+    redis_cache_service._retired_clients.clear()
+    redis_cache_service._draining_clients.clear()
+    redis_cache_service._url_refresh_task = None
+    redis_cache_service._l1_cache.clear()
+    redis_cache_service._circuit_breaker.reset()
 
 
 # --- 3.1: Cold cache calls get_redis_url(db=0) ---
@@ -62,6 +86,7 @@ async def test_re_resolves_after_ttl(mock_time, mock_get_url, mock_aioredis):
     await redis_cache_service.get_redis_client()
     assert mock_get_url.call_count == 1
     await redis_cache_service.get_redis_client()
+    await redis_cache_service._url_refresh_task
     assert mock_get_url.call_count == 2
 
 
@@ -74,7 +99,7 @@ async def test_connection_error_invalidates_cache(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.side_effect = RedisConnectionError("refused")
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     await redis_cache_service.get_cached_price_async("eth")
     assert redis_cache_service._cached_redis_url is None
 
@@ -88,7 +113,7 @@ async def test_timeout_error_invalidates_cache(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.side_effect = RedisTimeoutError("timed out")
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     await redis_cache_service.get_cached_price_async("eth")
     assert redis_cache_service._cached_redis_url is None
 
@@ -102,7 +127,7 @@ async def test_os_error_invalidates_cache(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.side_effect = OSError("network unreachable")
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     await redis_cache_service.get_cached_price_async("eth")
     assert redis_cache_service._cached_redis_url is None
 
@@ -116,7 +141,7 @@ async def test_response_error_no_invalidation(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.side_effect = ResponseError("WRONGTYPE")
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     await redis_cache_service.get_cached_price_async("eth")
     assert redis_cache_service._cached_redis_url is not None
 
@@ -130,32 +155,26 @@ async def test_data_error_no_invalidation(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.side_effect = DataError("invalid data")
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     await redis_cache_service.get_cached_price_async("eth")
     assert redis_cache_service._cached_redis_url is not None
 
 
-# --- 3.9: Import-time guard ---
+# --- 3.9: Shared library version guard (checked at startup) ---
 
-def test_import_guard_rejects_missing_db_param():
-    """Reload the module with a get_redis_url lacking db param;
-    verify ImportError is raised by the real guard logic."""
+def test_shared_library_check_rejects_missing_db_param():
+    """A get_redis_url lacking the db param fails the startup check."""
     def fake_get_redis_url():
         return "redis://localhost:6379/0"
 
-    with patch.dict(sys.modules, {'aioredis': MagicMock()}):
-        with patch(
-            "cryptofund20x_services.db_layer_caller.get_redis_url",
-            fake_get_redis_url
-        ):
-            mod_name = "pricing.redis_cache_service"
-            saved = sys.modules.pop(mod_name, None)
-            try:
-                with pytest.raises(ImportError, match="lacks 'db' parameter"):
-                    importlib.import_module(mod_name)
-            finally:
-                if saved is not None:
-                    sys.modules[mod_name] = saved
+    with patch("pricing.redis_cache_service.get_redis_url", fake_get_redis_url):
+        with pytest.raises(ImportError, match="lacks 'db' parameter"):
+            redis_cache_service.check_shared_library()
+
+
+def test_shared_library_check_accepts_db_param():
+    with patch("pricing.redis_cache_service.get_redis_url", lambda db=0: "redis://localhost:6379/0"):
+        redis_cache_service.check_shared_library()
 
 
 # --- 3.10: Returns parsed hash data ---
@@ -173,12 +192,13 @@ async def test_get_cached_price_returns_hash_data(
         'current_marketcap_usd': '50000000.0',
         'timestamp': now,
     }
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     result = await redis_cache_service.get_cached_price_async("eth")
-    assert result['usd_price'] == '2000.5'
-    assert result['volume_last_24_hours'] == '1000000.0'
-    assert result['current_marketcap_usd'] == '50000000.0'
-    assert result['timestamp'] == now
+    assert result.asset == "eth"
+    assert result.usd_price == 2000.5
+    assert result.volume_last_24_hours == 1000000.0
+    assert result.current_marketcap_usd == 50000000.0
+    assert result.updated_at == now
 
 
 # --- 3.11: Returns None when key does not exist ---
@@ -190,7 +210,7 @@ async def test_get_cached_price_returns_none_for_missing_key(
         mock_aioredis, mock_get_url):
     mock_client = AsyncMock()
     mock_client.hgetall.return_value = {}
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     result = await redis_cache_service.get_cached_price_async("nonexistent")
     assert result is None
 
@@ -210,7 +230,7 @@ async def test_timestamp_freshness_error_over_1_hour(
         'current_marketcap_usd': '100',
         'timestamp': old_time,
     }
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     with caplog.at_level(logging.ERROR, logger="redis_cache"):
         await redis_cache_service.get_cached_price_async("eth")
     assert any("more than 1 hour old" in r.message for r in caplog.records)
@@ -229,7 +249,697 @@ async def test_timestamp_freshness_warning_over_30_min(
         'current_marketcap_usd': '100',
         'timestamp': old_time,
     }
-    mock_aioredis.from_url.return_value = mock_client
+    mock_aioredis.Redis.return_value = mock_client
     with caplog.at_level(logging.WARNING, logger="redis_cache"):
         await redis_cache_service.get_cached_price_async("eth")
     assert any("more than 30 minutes old" in r.message for r in caplog.records)
+
+
+# --- Batch: pipelined multi-asset fetch ---
+
+def _pipeline_client(responses=None, execute_side_effect=None):
+    mock_pipe = MagicMock()
+    mock_pipe.execute = AsyncMock(return_value=responses,
+                                  side_effect=execute_side_effect)
+    mock_client = AsyncMock()
+    mock_client.pipeline = MagicMock(return_value=mock_pipe)
+    return mock_client, mock_pipe
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_get_cached_prices_uses_single_pipeline(
+        mock_aioredis, mock_get_url):
+    mock_client, mock_pipe = _pipeline_client([price_hash('100'), {}])
+    mock_aioredis.Redis.return_value = mock_client
+    result = await redis_cache_service.get_cached_prices_async(
+        ["eth", "missing", "eth"])
+    assert result["eth"].usd_price == 100.0
+    assert result["missing"] is None
+    assert [c.args for c in mock_pipe.hgetall.call_args_list] == [
+        ("price:eth",), ("price:missing",)]
+    mock_pipe.execute.assert_awaited_once()
+    mock_client.hgetall.assert_not_called()
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_get_cached_prices_isolates_per_asset_errors(
+        mock_aioredis, mock_get_url):
+    mock_client, _ = _pipeline_client(
+        [ResponseError("WRONGTYPE"), price_hash('100')])
+    mock_aioredis.Redis.return_value = mock_client
+    result = await redis_cache_service.get_cached_prices_async(["bad", "eth"])
+    assert result["bad"] is None
+    assert result["eth"] is not None
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_get_cached_prices_connection_error_invalidates_cache(
+        mock_aioredis, mock_get_url):
+    mock_client, _ = _pipeline_client(
+        execute_side_effect=RedisConnectionError("refused"))
+    mock_aioredis.Redis.return_value = mock_client
+    result = await redis_cache_service.get_cached_prices_async(["eth", "btc"])
+    assert result == {"eth": None, "btc": None}
+    assert redis_cache_service._cached_redis_url is None
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_get_cached_prices_keeps_staleness_logging(
+        mock_aioredis, mock_get_url, caplog):
+    old_time = (datetime.now() - timedelta(hours=2)).isoformat()
+    mock_client, _ = _pipeline_client([price_hash(timestamp=old_time)])
+    mock_aioredis.Redis.return_value = mock_client
+    with caplog.at_level(logging.ERROR, logger="redis_cache"):
+        await redis_cache_service.get_cached_prices_async(["eth"])
+    assert any("eth is more than 1 hour old" in r.message
+               for r in caplog.records)
+
+
+# --- Shared client: reuse, rebuild and shutdown ---
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_client_is_reused_across_calls(mock_get_url, mock_aioredis):
+    mock_aioredis.Redis.return_value = AsyncMock()
+    first = await redis_cache_service.get_redis_client()
+    second = await redis_cache_service.get_redis_client()
+    assert first is second
+    mock_aioredis.BlockingConnectionPool.from_url.assert_called_once_with(
+        "redis://192.168.1.252:6379/0", decode_responses=True, db=0,
+        max_connections=redis_cache_service._MAX_CONNECTIONS,
+        timeout=redis_cache_service._POOL_TIMEOUT,
+        socket_timeout=redis_cache_service._SOCKET_TIMEOUT)
+    mock_aioredis.Redis.assert_called_once_with(
+        connection_pool=mock_aioredis.BlockingConnectionPool.from_url.return_value)
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_lookups_beyond_pool_size_wait_for_a_connection(mock_get_url):
+    redis_asyncio = pytest.importorskip("redis.asyncio")
+    fakeredis_aioredis = pytest.importorskip("fakeredis.aioredis")
+    server = pytest.importorskip("fakeredis").FakeServer()
+
+    connections = []
+
+    class SlowConnection(fakeredis_aioredis.FakeAsyncRedisConnection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            connections.append(self)
+
+        # Hold each connection across a yield so the lookups overlap
+        async def read_response(self, *args, **kwargs):
+            await asyncio.sleep(0.01)
+            return await super().read_response(*args, **kwargs)
+
+    class FakeBlockingPool(redis_asyncio.BlockingConnectionPool):
+        @classmethod
+        def from_url(cls, url, **kwargs):
+            return super().from_url(url, connection_class=SlowConnection, server=server, **kwargs)
+
+    seed = fakeredis_aioredis.FakeRedis(server=server, decode_responses=True)
+    assets = [f"asset{i}" for i in range(10)]
+    for asset in assets:
+        await seed.hset(f"price:{asset}", mapping=price_hash('100'))
+
+    stand_in = SimpleNamespace(BlockingConnectionPool=FakeBlockingPool, Redis=redis_asyncio.Redis)
+    with patch.object(redis_cache_service, "aioredis", stand_in), \
+            patch.object(redis_cache_service, "_MAX_CONNECTIONS", 2):
+        try:
+            results = await asyncio.gather(
+                *(redis_cache_service.get_cached_price_async(asset) for asset in assets))
+        finally:
+            await redis_cache_service.close_redis_client()
+    assert [record.usd_price for record in results] == [100.0] * len(assets)
+    assert len(connections) == 2
+    assert redis_cache_service._circuit_breaker.state == redis_cache_service._CircuitBreaker.CLOSED
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_client_rebuilt_and_old_closed_after_invalidation(
+        mock_get_url, mock_aioredis):
+    old_client, new_client = AsyncMock(), AsyncMock()
+    mock_aioredis.Redis.side_effect = [old_client, new_client]
+    assert await redis_cache_service.get_redis_client() is old_client
+    redis_cache_service._invalidate_url_cache()
+    assert await redis_cache_service.get_redis_client() is new_client
+    old_client.close.assert_awaited_once()
+    old_client.connection_pool.disconnect.assert_awaited_once_with(inuse_connections=False)
+    new_client.close.assert_not_awaited()
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_failure_on_retired_client_keeps_current_client(
+        mock_get_url, mock_aioredis):
+    """A command timing out on an already-replaced client must not retire its replacement."""
+    old_client, new_client = AsyncMock(), AsyncMock()
+    mock_aioredis.Redis.side_effect = [old_client, new_client]
+    release = asyncio.Event()
+
+    async def slow_timeout(key):
+        await release.wait()
+        raise RedisTimeoutError("timed out")
+
+    old_client.hgetall.side_effect = slow_timeout
+    new_client.hgetall.return_value = price_hash('100')
+    await redis_cache_service.get_redis_client()
+    stale_lookup = asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth"))
+    while not old_client.hgetall.called:
+        await asyncio.sleep(0)
+
+    # Another command on the old pool failed: retire it and build a new one
+    redis_cache_service._invalidate_url_cache(old_client)
+    assert await redis_cache_service.get_cached_price_async("btc") is not None
+    release.set()
+    assert await stale_lookup is None
+
+    assert redis_cache_service._redis_client is new_client
+    assert redis_cache_service._cached_redis_url is not None
+    assert mock_get_url.call_count == 2
+    # The command in flight on the old pool was left to finish
+    old_client.connection_pool.disconnect.assert_awaited_once_with(inuse_connections=False)
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_retired_pool_closed_again_once_drained(mock_get_url, mock_aioredis):
+    old_client, new_client = AsyncMock(), AsyncMock()
+    mock_aioredis.Redis.side_effect = [old_client, new_client]
+    await redis_cache_service.get_redis_client()
+    redis_cache_service._invalidate_url_cache()
+    with patch.object(redis_cache_service, "_DRAIN_SECONDS", 0):
+        await redis_cache_service.get_redis_client()
+    assert old_client.connection_pool.disconnect.await_count == 2
+    assert not redis_cache_service._draining_clients
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url")
+@patch("pricing.redis_cache_service.time")
+async def test_client_rebuilt_when_url_changes_after_ttl(
+        mock_time, mock_get_url, mock_aioredis):
+    mock_time.monotonic.side_effect = [0.0, 400.0, 401.0, 401.0]
+    mock_get_url.side_effect = ["redis://10.0.0.1:6379/0",
+                                "redis://10.0.0.2:6379/0"]
+    old_client, new_client = AsyncMock(), AsyncMock()
+    mock_aioredis.Redis.side_effect = [old_client, new_client]
+    await redis_cache_service.get_redis_client()
+    # Expired TTL keeps serving the old client while the refresh runs
+    assert await redis_cache_service.get_redis_client() is old_client
+    await redis_cache_service._url_refresh_task
+    assert await redis_cache_service.get_redis_client() is new_client
+    old_client.connection_pool.disconnect.assert_awaited_once_with(inuse_connections=False)
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+async def test_close_redis_client_shuts_down_pool(mock_get_url, mock_aioredis):
+    client = AsyncMock()
+    mock_aioredis.Redis.return_value = client
+    await redis_cache_service.get_redis_client()
+    await redis_cache_service.close_redis_client()
+    client.close.assert_awaited_once()
+    client.connection_pool.disconnect.assert_awaited_once_with(inuse_connections=True)
+    assert redis_cache_service._redis_client is None
+
+
+# --- URL resolution: off the event loop, single-flight ---
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url")
+async def test_cold_resolution_is_single_flight(mock_get_url, mock_aioredis):
+    resolving = threading.Event()
+
+    def slow_get_url(db):
+        resolving.wait(timeout=5)
+        return "redis://192.168.1.252:6379/0"
+
+    mock_get_url.side_effect = slow_get_url
+    callers = [asyncio.ensure_future(redis_cache_service.get_redis_client())
+               for _ in range(10)]
+    await asyncio.sleep(0.05)
+    # The loop is still free while Consul is being queried
+    assert not any(c.done() for c in callers)
+    resolving.set()
+    clients = await asyncio.gather(*callers)
+    assert mock_get_url.call_count == 1
+    assert all(c is clients[0] for c in clients)
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url")
+@patch("pricing.redis_cache_service.time")
+async def test_expired_url_served_stale_while_refreshing(
+        mock_time, mock_get_url, mock_aioredis):
+    resolving = threading.Event()
+    urls = iter(["redis://10.0.0.1:6379/0", "redis://10.0.0.2:6379/0"])
+
+    def get_url(db):
+        url = next(urls)
+        if url.startswith("redis://10.0.0.2"):
+            resolving.wait(timeout=5)
+        return url
+
+    mock_get_url.side_effect = get_url
+    mock_time.monotonic.side_effect = [0.0, 400.0, 401.0, 402.0]
+    await redis_cache_service._get_redis_url()
+    stale = [await redis_cache_service._get_redis_url() for _ in range(3)]
+    assert stale == ["redis://10.0.0.1:6379/0"] * 3
+    resolving.set()
+    assert await redis_cache_service._url_refresh_task == "redis://10.0.0.2:6379/0"
+    assert mock_get_url.call_count == 2
+    assert redis_cache_service._cached_redis_url == "redis://10.0.0.2:6379/0"
+
+
+@patch("pricing.redis_cache_service.aioredis")
+@patch("pricing.redis_cache_service.get_redis_url",
+       side_effect=OSError("consul unreachable"))
+async def test_cold_resolution_failure_returns_none(mock_get_url, mock_aioredis):
+    result = await redis_cache_service.get_cached_price_async("eth")
+    assert result is None
+    mock_aioredis.Redis.assert_not_called()
+
+
+# --- L1 in-process cache ---
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_l1_cache_serves_repeat_lookups(mock_aioredis, mock_get_url):
+    mock_client = AsyncMock()
+    mock_client.hgetall.return_value = price_hash('100')
+    mock_aioredis.Redis.return_value = mock_client
+    hits = redis_cache_service.L1_CACHE_HITS._value.get()
+    first = await redis_cache_service.get_cached_price_async("eth")
+    second = await redis_cache_service.get_cached_price_async("eth")
+    assert first is second
+    mock_client.hgetall.assert_awaited_once()
+    assert redis_cache_service.L1_CACHE_HITS._value.get() == hits + 1
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_l1_cache_does_not_pin_missing_assets(mock_aioredis, mock_get_url):
+    mock_client = AsyncMock()
+    mock_client.hgetall.return_value = {}
+    mock_aioredis.Redis.return_value = mock_client
+    await redis_cache_service.get_cached_price_async("missing")
+    await redis_cache_service.get_cached_price_async("missing")
+    assert mock_client.hgetall.await_count == 2
+    assert len(redis_cache_service._l1_cache) == 0
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_l1_entry_past_max_age_is_read_again(mock_aioredis, mock_get_url):
+    old = PriceRecord.from_hash("eth", price_hash('100', age_seconds=4000))
+    redis_cache_service._l1_cache.put("eth", old)
+    mock_client, mock_pipe = _pipeline_client([price_hash('200')])
+    mock_client.hgetall.return_value = price_hash('200')
+    mock_aioredis.Redis.return_value = mock_client
+    assert (await redis_cache_service.get_cached_prices_async(["eth"]))["eth"].usd_price == 200.0
+    redis_cache_service._l1_cache.put("eth", old)
+    assert (await redis_cache_service.get_cached_price_async("eth")).usd_price == 200.0
+    mock_client.hgetall.assert_awaited_once()
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_batch_only_pipelines_l1_misses(mock_aioredis, mock_get_url):
+    redis_cache_service._l1_cache.put(
+        "eth", PriceRecord.from_hash("eth", price_hash('100')))
+    mock_client, mock_pipe = _pipeline_client([price_hash('100')])
+    mock_aioredis.Redis.return_value = mock_client
+    result = await redis_cache_service.get_cached_prices_async(["eth", "btc"])
+    assert set(result) == {"eth", "btc"}
+    assert [c.args for c in mock_pipe.hgetall.call_args_list] == [("price:btc",)]
+    assert "btc" in redis_cache_service._l1_cache._entries
+
+
+def test_l1_cache_evicts_least_recently_used():
+    cache = redis_cache_service._L1Cache(ttl=60, max_entries=2)
+    evictions = redis_cache_service.L1_CACHE_EVICTIONS._value.get()
+    cache.put("a", {"usd_price": "1"})
+    cache.put("b", {"usd_price": "2"})
+    cache.get("a")
+    cache.put("c", {"usd_price": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert redis_cache_service.L1_CACHE_EVICTIONS._value.get() == evictions + 1
+
+
+@patch("pricing.redis_cache_service.time")
+def test_l1_cache_entries_expire_after_ttl(mock_time):
+    cache = redis_cache_service._L1Cache(ttl=5, max_entries=10)
+    mock_time.monotonic.return_value = 100.0
+    cache.put("eth", {"usd_price": "1"})
+    mock_time.monotonic.return_value = 104.0
+    assert cache.get("eth") is not None
+    mock_time.monotonic.return_value = 105.0
+    assert cache.get("eth") is None
+
+
+# --- Push-based invalidation (pub/sub and keyspace notifications) ---
+
+def test_asset_from_message_parses_keyspace_and_channel_messages():
+    keyspace = {'type': 'pmessage', 'pattern': '__keyspace@0__:price:*',
+                'channel': '__keyspace@0__:price:eth', 'data': 'hset'}
+    channel = {'type': 'message', 'pattern': None,
+               'channel': 'price-updates', 'data': 'btc'}
+    other = {'type': 'pmessage', 'pattern': '__keyspace@0__:price:*',
+             'channel': '__keyspace@0__:other:eth', 'data': 'hset'}
+    assert redis_cache_service._asset_from_message(keyspace) == "eth"
+    assert redis_cache_service._asset_from_message(channel) == "btc"
+    assert redis_cache_service._asset_from_message(other) is None
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_listener_invalidates_changed_assets_only(
+        mock_aioredis, mock_get_url):
+    fakeredis_aioredis = pytest.importorskip("fakeredis.aioredis")
+    fake_redis = fakeredis_aioredis.FakeRedis(decode_responses=True)
+    await fake_redis.config_set('notify-keyspace-events', 'Kh')
+    mock_aioredis.Redis.return_value = fake_redis
+    invalidated = []
+    redis_cache_service.add_invalidation_listener(invalidated.append)
+    task = asyncio.ensure_future(
+        redis_cache_service._listen_for_invalidations())
+    try:
+        cache = redis_cache_service._l1_cache
+        await _wait_for(
+            lambda: cache.ttl == redis_cache_service._L1_SUBSCRIBED_TTL)
+        for asset in ("eth", "btc", "sol"):
+            cache.put(asset, PriceRecord.from_hash(asset, price_hash('100')))
+        await fake_redis.hset("price:eth", "usd_price", "2100")
+        await fake_redis.publish(redis_cache_service.PRICE_UPDATE_CHANNEL, "btc")
+        await _wait_for(lambda: len(invalidated) == 2)
+        assert invalidated == ["eth", "btc"]
+        assert set(cache._entries) == {"sol"}
+    finally:
+        redis_cache_service._invalidation_listeners.remove(invalidated.append)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_read_racing_an_invalidation_is_not_cached(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def hgetall(key):
+        await release.wait()
+        return price_hash('100')
+
+    mock_client = AsyncMock()
+    mock_client.hgetall.side_effect = hgetall
+    mock_aioredis.Redis.return_value = mock_client
+    lookup = asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth"))
+    while not mock_client.hgetall.called:
+        await asyncio.sleep(0)
+
+    redis_cache_service._invalidate_asset("eth")
+    release.set()
+
+    assert await lookup is not None
+    assert redis_cache_service._l1_cache.get("eth") is None
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_pipeline_racing_an_invalidation_caches_only_unchanged_assets(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def execute(**kwargs):
+        await release.wait()
+        return [price_hash('100'), price_hash('100')]
+
+    mock_client, mock_pipe = _pipeline_client(execute_side_effect=execute)
+    mock_aioredis.Redis.return_value = mock_client
+    lookup = asyncio.ensure_future(redis_cache_service.get_cached_prices_async(["eth", "btc"]))
+    while not mock_pipe.execute.called:
+        await asyncio.sleep(0)
+
+    redis_cache_service._invalidate_asset("eth")
+    release.set()
+
+    assert set(await lookup) == {"eth", "btc"}
+    assert redis_cache_service._l1_cache.get("eth") is None
+    assert redis_cache_service._l1_cache.get("btc") is not None
+
+
+@patch("pricing.redis_cache_service._INVALIDATION_RETRY_SECONDS", 60)
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_listener_drop_falls_back_to_ttl(mock_aioredis, mock_get_url):
+    pubsub = MagicMock()
+    pubsub.psubscribe = AsyncMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.close = AsyncMock()
+    pubsub.get_message = AsyncMock(side_effect=RedisConnectionError("reset"))
+    mock_client = AsyncMock()
+    mock_client.pubsub = MagicMock(return_value=pubsub)
+    mock_aioredis.Redis.return_value = mock_client
+    cache = redis_cache_service._l1_cache
+    cache.put("eth", PriceRecord.from_hash("eth", price_hash('100')))
+    task = asyncio.ensure_future(
+        redis_cache_service._listen_for_invalidations())
+    try:
+        await _wait_for(lambda: pubsub.close.await_count == 1)
+        assert cache.ttl == redis_cache_service._L1_TTL
+        assert len(cache) == 0
+        assert redis_cache_service._cached_redis_url is None
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# --- Circuit breaker ---
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_circuit_opens_and_fails_fast(mock_aioredis, mock_get_url):
+    mock_client = AsyncMock()
+    mock_client.hgetall.side_effect = RedisConnectionError("refused")
+    mock_aioredis.Redis.return_value = mock_client
+    threshold = redis_cache_service._CIRCUIT_FAILURE_THRESHOLD
+    for _ in range(threshold):
+        await redis_cache_service.get_cached_price_async("eth")
+    assert redis_cache_service.circuit_open()
+    assert redis_cache_service.REDIS_CIRCUIT_STATE._value.get() == 1
+
+    mock_get_url.reset_mock()
+    assert await redis_cache_service.get_cached_price_async("eth") is None
+    assert await redis_cache_service.get_cached_prices_async(["eth", "btc"]) == {
+        "eth": None, "btc": None}
+    assert mock_client.hgetall.await_count == threshold
+    mock_get_url.assert_not_called()
+
+
+@pytest.mark.parametrize("error", [AioredisConnectionError, AioredisTimeoutError])
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_aioredis_network_errors_count_as_failures(mock_aioredis, mock_get_url, error):
+    # aioredis wraps a refused connection in its own ConnectionError, not an OSError
+    mock_client, _ = _pipeline_client(execute_side_effect=error("Connection refused"))
+    mock_client.hgetall.side_effect = error("Connection refused")
+    mock_aioredis.Redis.return_value = mock_client
+    for _ in range(redis_cache_service._CIRCUIT_FAILURE_THRESHOLD - 1):
+        await redis_cache_service.get_cached_price_async("eth")
+    assert redis_cache_service.redis_unavailable()
+    assert redis_cache_service._cached_redis_url is None
+
+    assert await redis_cache_service.get_cached_prices_async(["eth", "btc"]) == {"eth": None, "btc": None}
+    assert redis_cache_service.circuit_open()
+
+
+@patch("pricing.redis_cache_service.time")
+def test_circuit_half_open_allows_single_probe(mock_time):
+    breaker = redis_cache_service._CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    mock_time.monotonic.return_value = 100.0
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    mock_time.monotonic.return_value = 110.0
+    assert breaker.allow_request()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow_request()
+
+
+@patch("pricing.redis_cache_service.time")
+def test_circuit_failed_probe_reopens(mock_time):
+    breaker = redis_cache_service._CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    mock_time.monotonic.return_value = 100.0
+    breaker.record_failure()
+    mock_time.monotonic.return_value = 111.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    mock_time.monotonic.return_value = 115.0
+    assert not breaker.allow_request()
+
+
+# --- Single-flight: concurrent identical lookups share one read ---
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_concurrent_single_lookups_share_one_hgetall(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def hgetall(key):
+        await release.wait()
+        return price_hash('100')
+
+    mock_client = AsyncMock()
+    mock_client.hgetall.side_effect = hgetall
+    mock_aioredis.Redis.return_value = mock_client
+    coalesced = redis_cache_service.REDIS_COALESCED_CALLS._value.get()
+
+    lookups = [asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth")) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    release.set()
+    records = await asyncio.gather(*lookups)
+
+    assert mock_client.hgetall.await_count == 1
+    assert all(record is records[0] for record in records)
+    assert redis_cache_service.REDIS_COALESCED_CALLS._value.get() - coalesced == 9
+    assert not redis_cache_service._in_flight
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_single_lookup_joins_in_flight_pipeline(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def execute(raise_on_error=True):
+        await release.wait()
+        return [price_hash('100'), price_hash('100')]
+
+    mock_client, mock_pipe = _pipeline_client()
+    mock_pipe.execute.side_effect = execute
+    mock_aioredis.Redis.return_value = mock_client
+
+    batch = asyncio.ensure_future(redis_cache_service.get_cached_prices_async(["eth", "btc"]))
+    await asyncio.sleep(0.01)
+    single = asyncio.ensure_future(redis_cache_service.get_cached_price_async("btc"))
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert (await single) is (await batch)["btc"]
+    mock_client.hgetall.assert_not_called()
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_lookup_after_invalidation_does_not_join_older_read(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def hgetall(key):
+        if mock_client.hgetall.call_count == 1:
+            await release.wait()
+            return price_hash('100')
+        return price_hash('200')
+
+    mock_client = AsyncMock()
+    mock_client.hgetall.side_effect = hgetall
+    mock_aioredis.Redis.return_value = mock_client
+    before = asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth"))
+    while not mock_client.hgetall.called:
+        await asyncio.sleep(0)
+
+    redis_cache_service._invalidate_asset("eth")
+    after = await asyncio.wait_for(redis_cache_service.get_cached_price_async("eth"), 1)
+    release.set()
+
+    assert after.usd_price == 200.0
+    assert (await before).usd_price == 100.0
+    assert mock_client.hgetall.call_count == 2
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_cancelled_caller_does_not_cancel_shared_read(mock_aioredis, mock_get_url):
+    release = asyncio.Event()
+
+    async def hgetall(key):
+        await release.wait()
+        return price_hash('100')
+
+    mock_client = AsyncMock()
+    mock_client.hgetall.side_effect = hgetall
+    mock_aioredis.Redis.return_value = mock_client
+
+    first = asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth"))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(redis_cache_service.get_cached_price_async("eth"))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert (await second).usd_price == 100.0
+    assert first.cancelled()
+
+
+# --- Per-stage latency ---
+
+def _stage_count(name):
+    return REGISTRY.get_sample_value('price_stage_duration_seconds_count', {'stage': name}) or 0
+
+
+@patch("pricing.redis_cache_service.get_redis_url",
+       return_value="redis://192.168.1.252:6379/0")
+@patch("pricing.redis_cache_service.aioredis")
+async def test_lookup_stages_are_timed(mock_aioredis, mock_get_url):
+    mock_client, _ = _pipeline_client([price_hash('100')])
+    mock_client.hgetall.return_value = price_hash('100')
+    mock_aioredis.Redis.return_value = mock_client
+    stages = ('redis_url_resolve', 'redis_client_create', 'redis_client', 'redis_hgetall', 'parse', 'redis_pipeline')
+    before = {name: _stage_count(name) for name in stages}
+
+    await redis_cache_service.get_cached_price_async("eth")
+    await redis_cache_service.get_cached_prices_async(["btc"])
+
+    after = {name: _stage_count(name) - before[name] for name in stages}
+    assert after == {'redis_url_resolve': 1, 'redis_client_create': 1, 'redis_client': 2,
+                     'redis_hgetall': 1, 'parse': 2, 'redis_pipeline': 1}
+
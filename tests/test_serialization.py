@@ -0,0 +1,64 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from pricing import serialization
+from pricing.price_record import PriceRecord
+from tests.factories import price_record
+
+BACKENDS = ["json"] + (["orjson"] if serialization.orjson is not None else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    with patch.object(serialization, "_BACKEND", request.param):
+        yield request.param
+
+
+def test_price_response_schema(backend):
+    record = price_record("ethereum")
+    body = json.loads(serialization.price_response("weth", "ethereum", record))
+    assert body == {"asset": "weth", "canonical_asset": "ethereum", "stale": False, **record.to_dict()}
+
+
+def test_price_event_schema(backend):
+    record = price_record("ethereum")
+    body = json.loads(serialization.price_event(record, stale=True))
+    assert body == {"asset": "ethereum", "stale": True, **record.to_dict()}
+
+
+def test_prices_response_schema(backend):
+    prices = {"ethereum": price_record("ethereum"), "bitcoin": price_record("bitcoin", '60000')}
+    body = json.loads(serialization.prices_response(
+        prices, ["missing"], {"weth": "ethereum", "bitcoin": "bitcoin", "missing": "missing"}))
+    assert body["prices"] == {asset: record.to_dict() for asset, record in prices.items()}
+    assert body["failed"] == ["missing"]
+    assert body["aliases"]["weth"] == "ethereum"
+
+
+def test_prices_columnar_response(backend):
+    prices = {"ethereum": price_record("ethereum"), "bitcoin": price_record("bitcoin", '60000')}
+    body = json.loads(serialization.prices_columnar_response(prices, ["missing"], {}, ["bitcoin"], ["usd_price"]))
+    assert body == {"assets": ["ethereum", "bitcoin"], "columns": {"usd_price": [2000.5, 60000.0]},
+                    "failed": ["missing"], "stale": ["bitcoin"], "aliases": {}}
+
+
+def test_prices_response_with_no_prices(backend):
+    body = json.loads(serialization.prices_response({}, ["a", "b"], {}))
+    assert body == {"prices": {}, "failed": ["a", "b"], "stale": [], "aliases": {}}
+
+
+def test_price_headers_report_oldest_age_and_staleness():
+    fresh = price_record("ethereum")
+    old = PriceRecord.from_hash("bitcoin", {'usd_price': '1', 'timestamp': '2020-01-01T00:00:00'})
+    headers = serialization.price_headers([fresh, old], stale=True)
+    assert int(headers['X-Price-Age']) == int(old.age())
+    assert headers['X-Price-Stale'] == 'true'
+    assert 'X-Price-Stale' not in serialization.price_headers([fresh])
+
+
+def test_record_json_is_encoded_once():
+    record = price_record("ethereum")
+    assert record.to_json() is record.to_json()
+    assert json.loads(record.to_json()) == record.to_dict()
@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+import pytest
+
+import server
+
+
+def _files(contents):
+    def read(path):
+        return contents.get(path)
+    return read
+
+
+# --- Worker count ---
+
+def test_worker_count_prefers_configuration(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    assert server.worker_count() == 3
+
+
+def test_worker_count_defaults_to_available_cpus(monkeypatch):
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    with patch.object(server, 'available_cpus', return_value=6):
+        assert server.worker_count() == 6
+
+
+@pytest.mark.parametrize('files, expected', [
+    ({server._CGROUP_V2_CPU_MAX: '250000 100000'}, 3),
+    ({server._CGROUP_V2_CPU_MAX: 'max 100000'}, 8),
+    ({server._CGROUP_V1_QUOTA: '100000', server._CGROUP_V1_PERIOD: '100000'}, 1),
+    ({server._CGROUP_V1_QUOTA: '-1', server._CGROUP_V1_PERIOD: '100000'}, 8),
+    ({}, 8),
+])
+def test_available_cpus_respects_cgroup_quota(files, expected):
+    with patch.object(server, '_read', _files(files)), \
+            patch('server.os.sched_getaffinity', return_value=set(range(8))):
+        assert server.available_cpus() == expected
+
+
+# --- Loop and HTTP implementation ---
+
+def test_uses_uvloop_and_httptools_when_installed():
+    with patch.object(server, '_installed', return_value=True):
+        assert (server.event_loop(), server.http_protocol()) == ('uvloop', 'httptools')
+
+
+def test_falls_back_to_asyncio_and_h11():
+    with patch.object(server, '_installed', return_value=False):
+        assert (server.event_loop(), server.http_protocol()) == ('asyncio', 'h11')
@@ -0,0 +1,88 @@
+import logging
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from pricing import staleness
+from pricing.staleness import StalenessPolicy
+from tests.factories import price_record
+
+
+@pytest.fixture(autouse=True)
+def reset_oldest_window():
+    staleness._oldest_age = 0.0
+    staleness._oldest_window_started = 0.0
+    yield
+
+
+# --- Policy configuration ---
+
+def test_overrides_merge_over_default_policy():
+    default = StalenessPolicy(warn_after=1800, max_age=3600, action=staleness.FLAG)
+    overrides = staleness._parse_overrides('{"usd-coin": {"max_age": 86400, "action": "accept"}}', default)
+    assert overrides["usd-coin"] == StalenessPolicy(warn_after=1800, max_age=86400, action=staleness.ACCEPT)
+
+
+def test_override_numbers_are_coerced_to_seconds():
+    default = StalenessPolicy(warn_after=1800, max_age=3600, action=staleness.FLAG)
+    overrides = staleness._parse_overrides('{"eth": {"max_age": "86400", "action": "REJECT"}}', default)
+    assert overrides["eth"] == StalenessPolicy(warn_after=1800, max_age=86400.0, action=staleness.REJECT)
+
+
+@pytest.mark.parametrize("raw", ['{"eth": {"action": "drop"}}', '{"eth": 5}', '{"eth": {"max_agee": 1}}',
+                                 '{"eth": {"max_age": "a day"}}', '{"eth": {"warn_after": null}}'])
+def test_invalid_overrides_raise(raw):
+    default = StalenessPolicy(warn_after=1800, max_age=3600, action=staleness.FLAG)
+    with pytest.raises(ValueError):
+        staleness._parse_overrides(raw, default)
+
+
+# --- Evaluation at serve time ---
+
+@pytest.mark.parametrize("action", [staleness.ACCEPT, staleness.FLAG, staleness.REJECT])
+def test_old_price_gets_policy_action(action):
+    policy = StalenessPolicy(warn_after=60, max_age=120, action=action)
+    with patch.object(staleness, "_overrides", {"eth": policy}):
+        assert staleness.action_for(price_record("eth", age_seconds=60)) == staleness.ACCEPT
+        assert staleness.action_for(price_record("eth", age_seconds=600)) == action
+        # Other assets keep the default policy
+        assert staleness.action_for(price_record("btc", age_seconds=600)) == staleness.ACCEPT
+
+
+def test_policy_lookup_records_no_metrics():
+    count = REGISTRY.get_sample_value('price_age_seconds_count')
+    staleness.action_for(price_record("eth", age_seconds=600))
+    assert REGISTRY.get_sample_value('price_age_seconds_count') == count
+    assert staleness._oldest_age == 0.0
+
+
+def test_served_price_counted_as_stale_under_its_policy_action():
+    policy = StalenessPolicy(warn_after=60, max_age=120, action=staleness.FLAG)
+    flagged = REGISTRY.get_sample_value('price_stale_total', {'action': 'flag'}) or 0
+    with patch.object(staleness, "_overrides", {"eth": policy}):
+        staleness.observe_served(price_record("eth", age_seconds=60))
+        staleness.observe_served(price_record("eth", age_seconds=600))
+    assert REGISTRY.get_sample_value('price_stale_total', {'action': 'flag'}) == flagged + 1
+
+
+def test_oldest_served_gauge_tracks_window_maximum():
+    staleness.observe_served(price_record("eth", age_seconds=500))
+    staleness.observe_served(price_record("btc", age_seconds=10))
+    assert 499 < staleness._oldest_age < 510
+
+    staleness._oldest_window_started -= staleness._OLDEST_WINDOW_SECONDS
+    staleness.observe_served(price_record("btc", age_seconds=10))
+    assert staleness._oldest_age < 20
+
+
+def test_log_uses_policy_thresholds(caplog):
+    log = logging.getLogger("staleness_test")
+    policy = StalenessPolicy(warn_after=300, max_age=7200, action=staleness.FLAG)
+    with patch.object(staleness, "_overrides", {"eth": policy}), caplog.at_level(logging.WARNING, "staleness_test"):
+        staleness.log_if_stale(price_record("eth", age_seconds=600), log)
+        staleness.log_if_stale(price_record("eth", age_seconds=8000), log)
+    assert [r.message for r in caplog.records] == [
+        "Cache item for eth is more than 5 minutes old.",
+        "Cache item for eth is more than 2 hours old.",
+    ]
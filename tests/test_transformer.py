@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+import transformer
+
+
+@pytest.fixture(autouse=True)
+def restore_aliases():
+    """Reload the shipped alias table after each test."""
+    yield
+    transformer.reload_aliases()
+
+
+def _write_aliases(tmp_path, content):
+    path = tmp_path / "aliases.json"
+    path.write_text(content)
+    return str(path)
+
+
+@pytest.mark.parametrize("asset, expected", [
+    ("eth", "ethereum"),
+    ("weth", "ethereum"),
+    ("grt", "the-graph"),
+    ("GRT", "the-graph"),
+    ("SDT", "stake-dao"),
+    ("gmx", "GMX"),
+    ("lyra", "lyra-finance"),
+    ("wbtc", "wrapped-bitcoin"),
+])
+def test_transform_asset_resolves_shipped_aliases(asset, expected):
+    assert transformer.transform_asset(asset) == expected
+
+
+def test_transform_asset_is_case_insensitive():
+    assert transformer.transform_asset("WETH") == "ethereum"
+    assert transformer.transform_asset("Crv") == "curve-dao-token"
+
+
+def test_transform_asset_passes_unknown_assets_through():
+    assert transformer.transform_asset("ethereum") == "ethereum"
+    assert transformer.transform_asset("GMX") == "GMX"
+    assert transformer.transform_asset("Some-Token") == "Some-Token"
+
+
+def test_load_aliases_rejects_duplicates(tmp_path):
+    path = _write_aliases(tmp_path, '{"lyra": "lyra-finance", "LYRA": "lyra-finance"}')
+    with pytest.raises(ValueError, match="Duplicate alias"):
+        transformer.load_aliases(path)
+
+
+def test_load_aliases_rejects_cycles(tmp_path):
+    path = _write_aliases(tmp_path, json.dumps({"a": "b", "b": "c", "c": "a"}))
+    with pytest.raises(ValueError, match="Alias cycle"):
+        transformer.load_aliases(path)
+
+
+def test_load_aliases_flattens_chains(tmp_path):
+    path = _write_aliases(tmp_path, json.dumps({"weth": "eth", "eth": "ethereum"}))
+    assert transformer.load_aliases(path) == {"weth": "ethereum", "eth": "ethereum"}
+
+
+def test_reload_if_changed_picks_up_edits(tmp_path):
+    path = _write_aliases(tmp_path, json.dumps({"eth": "ethereum"}))
+    assert transformer.reload_aliases(path)
+    assert not transformer.reload_if_changed(path)
+
+    with open(path, "w") as f:
+        json.dump({"eth": "ether"}, f)
+    os.utime(path, (0, os.stat(path).st_mtime + 1))
+    assert transformer.reload_if_changed(path)
+    assert transformer.transform_asset("eth") == "ether"
+
+
+def test_invalid_reload_keeps_current_table(tmp_path):
+    path = _write_aliases(tmp_path, '{"eth": "ethereum", "eth": "ether"}')
+    assert not transformer.reload_aliases(path)
+    assert transformer.transform_asset("eth") == "ethereum"
+
+
+def test_resolve_assets_maps_requested_to_canonical():
+    resolved = transformer.resolve_assets(["eth", "WETH", "bitcoin", "eth"])
+    assert resolved == {"eth": "ethereum", "WETH": "ethereum", "bitcoin": "bitcoin"}
+    assert list(dict.fromkeys(resolved.values())) == ["ethereum", "bitcoin"]
@@ -1,72 +1,100 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from pricing import logging_setup
+
+# Alias table: lowercase ticker/alias -> canonical asset id as stored in Redis.
+# ASSET_ALIASES_PATH can point at a mounted file so aliases change without a
+# redeploy; price_app polls it through reload_if_changed().
+ALIASES_PATH = os.environ.get(
+    'ASSET_ALIASES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asset_aliases.json'))
+
+_aliases: Dict[str, str] = {}
+_aliases_mtime: Optional[float] = None
+
+# Setup logging
+logger = logging.getLogger("transformer")
+logging_setup.configure_logger(logger)
+
+
+def _reject_duplicate_keys(pairs: List[Tuple[str, str]]) -> Dict[str, str]:
+    table = {}
+    for alias, canonical in pairs:
+        if not isinstance(canonical, str) or not canonical:
+            raise ValueError(f"Alias {alias!r} must map to a non-empty string")
+        key = alias.lower()
+        if key in table:
+            raise ValueError(f"Duplicate alias {alias!r}")
+        table[key] = canonical
+    return table
+
+
+def _resolve_chain(alias: str, table: Dict[str, str]) -> str:
+    path = [alias]
+    canonical = table[alias]
+    while True:
+        key = canonical.lower()
+        if key not in table or table[key] == canonical:
+            return canonical
+        if key in path:
+            raise ValueError(f"Alias cycle: {' -> '.join(path + [key])}")
+        path.append(key)
+        canonical = table[key]
+
+
+def load_aliases(path: str = ALIASES_PATH) -> Dict[str, str]:
+    """Read and validate the alias file. Chains (a -> b -> c) are flattened so
+    every lookup is a single dict access; duplicates and cycles raise ValueError."""
+    with open(path) as f:
+        table = json.load(f, object_pairs_hook=_reject_duplicate_keys)
+    if not isinstance(table, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    return {alias: _resolve_chain(alias, table) for alias in table}
+
+
+def reload_aliases(path: str = ALIASES_PATH) -> bool:
+    """Swap in the aliases from ``path``. An invalid file keeps the current table."""
+    global _aliases, _aliases_mtime
+    try:
+        mtime = os.stat(path).st_mtime
+        aliases = load_aliases(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading asset aliases from {path}: {e}")
+        return False
+    _aliases = aliases
+    _aliases_mtime = mtime
+    logger.info(f"Loaded {len(aliases)} asset aliases from {path}")
+    return True
+
+
+def reload_if_changed(path: str = ALIASES_PATH) -> bool:
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError as e:
+        logger.error(f"Error checking asset aliases file {path}: {e}")
+        return False
+    if mtime == _aliases_mtime:
+        return False
+    return reload_aliases(path)
+
+
 def transform_asset(asset: str) -> str:
-    if asset == "gem":
-        asset = "gemswap"
-    if asset == "safe":
-        asset = "yieldfarming-insure"
-    if asset == "yamv2":
-        asset = "yam-v2"
-    if asset == "uni":
-        asset = "uniswap"
-    if asset == "ethemaapy":
-        asset = "eth-26-ma-crossover-yield-ii"
-    if asset == "vcrvplain3andsusd":
-        asset = "susd"
-    if asset == "mir":
-        asset = "mirror-protocol"
-    if asset == "bdp":
-        asset = "big-data-protocol"
-    if asset == "eth" or asset == "weth":
-        asset = "ethereum"
-    if asset == "GRT" or asset == "grt":
-        asset = "the-graph"
-    if asset == "snx":
-        asset = "havven"
-    if asset == "knc":
-        asset = "kyber-network"
-    if asset == "cvx":
-        asset = "convex-finance"
-    if asset == "rune":
-        asset = "thorchain-erc20"
-    if asset == "toke":
-        asset = "tokemak"
-    if asset == "rdpx":
-        asset = "dopex-rebate-token"
-    if asset == "sdt" or asset == "SDT":
-        asset = "stake-dao"
-    if asset == "gmx":
-        asset = "GMX"
-    if asset == "imx":
-        asset = "immutable-x"
-    if asset == "silo":
-        asset = "silo-finance"
-    if asset == "alpha":
-        asset = "alpha-finance"
-    if asset == "lyra":
-        asset = "lyra-finance"
-    if asset == "jpeg":
-        asset = "jpeg-d"
-    if asset == "ast":
-        asset = "airswap"
-    if asset == "pls":
-        asset = "plutusdao"
-    if asset == "usdc":
-        asset = "usd-coin"
-    if asset == "lyra":
-        asset = "lyra-finance"
-    if asset == "cnc":
-        asset = "conic-finance"
-    if asset == "gear":
-        asset = "gearbox"
-    if asset == "xgrail":
-        asset = "grail"
-    if asset == "crv":
-        asset = "curve-dao-token"
-    if asset == 'wbtc':
-        asset = 'wrapped-bitcoin'
-    if asset == 'alp':
-        asset = 'arbitrove-alp'
-
-    return asset
+    return _aliases.get(asset.lower(), asset)
+
+
+def resolve_assets(assets: List[str]) -> Dict[str, str]:
+    """Map each requested asset to its canonical id, in request order.
+
+    Requests that resolve to the same canonical asset (e.g. ``eth,weth``) stay
+    as separate keys here; ``dict.fromkeys(resolved.values())`` gives the
+    de-duplicated list to look up.
+    """
+    return {asset: transform_asset(asset) for asset in assets}
+
+
+reload_aliases()
 
 
 if __name__ == '__main__':
@@ -75,4 +103,3 @@ if __name__ == '__main__':
     asset1 = dict()
     asset1["asset"] = "weth"
     event1["queryStringParameters"] = asset1
-""